@@ -0,0 +1,283 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from playwright.async_api import async_playwright
+
+import cache
+from sources.base import Item
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONTEXTS = 4
+DEFAULT_MAX_PAGES = 8
+
+# Lean mode: resource types that are never needed to read text off a page.
+DEFAULT_BLOCKED_RESOURCES = ["image", "media", "font"]
+# Static assets worth keeping on disk between hourly runs.
+_DISK_CACHED_RESOURCES = {"script", "stylesheet"}
+_DEFAULT_DISK_CACHE_TTL_HOURS = 24
+# Headers describing the wire encoding; cached bodies are stored decoded.
+_HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+# Headers that belong to one response and must never be replayed from disk.
+_PRIVATE_HEADERS = {"set-cookie", "set-cookie2"}
+_MAX_AGE_RE = re.compile(r"(?:^|,)\s*max-age\s*=\s*\"?(\d+)", re.IGNORECASE)
+
+FetchFn = Callable[[dict, object], Awaitable[list[Item]]]
+
+
+async def fetch_all(
+    jobs: dict[str, tuple[FetchFn, dict]],
+    config: dict,
+    on_items: Callable[[str, list[Item]], None],
+) -> None:
+    """Run every browser source concurrently on one Chromium instance.
+
+    `jobs` maps source name to (fetch, source_cfg). `on_items(name, items)` is
+    called as soon as each source finishes, so callers can start summarizing
+    without waiting for the slowest scrape. A failing source is logged and
+    skipped; it never cancels the others.
+    """
+    async with async_playwright() as pw:
+        chromium = await pw.chromium.launch(headless=True)
+        browser = LimitedBrowser(
+            chromium,
+            max_contexts=config.get("max_contexts", DEFAULT_MAX_CONTEXTS),
+            max_pages=config.get("max_pages", DEFAULT_MAX_PAGES),
+            route_handler=_lean_route_handler(config) if config.get("lean") else None,
+        )
+        try:
+            await asyncio.gather(
+                *(
+                    _fetch_one(name, fetch, source_cfg, browser, on_items)
+                    for name, (fetch, source_cfg) in jobs.items()
+                )
+            )
+        finally:
+            await chromium.close()
+
+
+async def _fetch_one(
+    name: str,
+    fetch: FetchFn,
+    source_cfg: dict,
+    browser: "LimitedBrowser",
+    on_items: Callable[[str, list[Item]], None],
+) -> None:
+    try:
+        items = await fetch(source_cfg, browser)
+    except Exception as e:
+        logger.error("Source '%s' failed: %s", name, e)
+        return
+    on_items(name, items)
+
+
+def _lean_route_handler(config: dict):
+    """Build a context route handler for lean page loads.
+
+    Requests for blocked resource types are aborted. Scripts and stylesheets
+    are served from a persistent on-disk cache when possible, since Playwright
+    contexts are off-the-record and never reuse Chromium's own disk cache.
+    """
+    blocked = set(config.get("block_resources", DEFAULT_BLOCKED_RESOURCES))
+    disk_cache = None
+    if config.get("disk_cache", True):
+        disk_cache = _DiskCache(
+            cache.CACHE_DIR / "browser",
+            ttl_hours=config.get("disk_cache_ttl_hours", _DEFAULT_DISK_CACHE_TTL_HOURS),
+        )
+        disk_cache.prune()
+
+    async def handle(route) -> None:
+        request = route.request
+        if request.resource_type in blocked:
+            await route.abort()
+            return
+        if (
+            disk_cache is None
+            or request.method != "GET"
+            or request.resource_type not in _DISK_CACHED_RESOURCES
+        ):
+            await route.continue_()
+            return
+        cached = disk_cache.get(request.url)
+        if cached is not None:
+            headers, body = cached
+            await route.fulfill(status=200, headers=headers, body=body)
+            return
+        response = await route.fetch()
+        if response.status == 200 and _storable(response.headers):
+            disk_cache.put(request.url, response.headers, await response.body())
+        await route.fulfill(response=response)
+
+    return handle
+
+
+def _storable(headers: dict) -> bool:
+    """Whether a response may be kept in the disk cache and replayed later.
+
+    Responses marked no-store or private, or that vary on anything but the
+    encoding (bodies are stored decoded), are never stored.
+    """
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-store" in cache_control or "private" in cache_control:
+        return False
+    vary = {v.strip().lower() for v in headers.get("vary", "").split(",") if v.strip()}
+    return vary <= {"accept-encoding"}
+
+
+def _max_age(headers: dict) -> int | None:
+    match = _MAX_AGE_RE.search(headers.get("cache-control", ""))
+    return int(match.group(1)) if match else None
+
+
+class _DiskCache:
+    """Static browser assets stored as <sha256(url)>.json + .body files.
+
+    An entry lives for the configured TTL, or for the response's own
+    Cache-Control max-age if that is shorter.
+    """
+
+    def __init__(self, directory: Path, ttl_hours: float):
+        self._dir = directory
+        self._ttl_seconds = ttl_hours * 3600
+
+    def get(self, url: str) -> tuple[dict, bytes] | None:
+        meta_file, body_file = self._paths(url)
+        try:
+            meta = json.loads(meta_file.read_text())
+            if time.time() >= meta["expires"]:
+                return None
+            return meta["headers"], body_file.read_bytes()
+        except (OSError, json.JSONDecodeError, KeyError, TypeError):
+            return None
+
+    def put(self, url: str, headers: dict, body: bytes) -> None:
+        lifetime = self._ttl_seconds
+        max_age = _max_age(headers)
+        if max_age is not None:
+            lifetime = min(lifetime, max_age)
+        if lifetime <= 0:
+            return
+        meta_file, body_file = self._paths(url)
+        headers = {
+            k: v
+            for k, v in headers.items()
+            if k.lower() not in _HOP_HEADERS and k.lower() not in _PRIVATE_HEADERS
+        }
+        meta = {"expires": time.time() + lifetime, "headers": headers}
+        try:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            # Body first: a meta file is only ever visible next to its body.
+            body_file.write_bytes(body)
+            meta_file.write_text(json.dumps(meta))
+        except OSError as e:
+            logger.warning("Failed to write browser cache entry for %s: %s", url, e)
+
+    def prune(self) -> None:
+        if not self._dir.exists():
+            return
+        cutoff = time.time() - self._ttl_seconds
+        for path in self._dir.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return self._dir / f"{key}.json", self._dir / f"{key}.body"
+
+
+class LimitedBrowser:
+    """Playwright Browser proxy that caps open contexts and pages.
+
+    Sources use it exactly like a Browser; `new_context()` and
+    `context.new_page()` wait for a free slot, and closing the context or page
+    gives the slot back. If `route_handler` is set, every new context routes
+    all of its requests through it.
+    """
+
+    def __init__(self, browser, max_contexts: int, max_pages: int, route_handler=None):
+        self._browser = browser
+        self._contexts = asyncio.Semaphore(max_contexts)
+        self._pages = asyncio.Semaphore(max_pages)
+        self._route_handler = route_handler
+
+    async def new_context(self, **kwargs) -> "LimitedContext":
+        await self._contexts.acquire()
+        try:
+            context = await self._browser.new_context(**kwargs)
+            if self._route_handler is not None:
+                await context.route("**/*", self._route_handler)
+        except BaseException:
+            self._contexts.release()
+            raise
+        return LimitedContext(context, self._contexts, self._pages)
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+
+class LimitedContext:
+    def __init__(self, context, contexts: asyncio.Semaphore, pages: asyncio.Semaphore):
+        self._context = context
+        self._contexts = contexts
+        self._pages = pages
+        self._open_pages: set[LimitedPage] = set()
+        self._closed = False
+
+    async def new_page(self) -> "LimitedPage":
+        await self._pages.acquire()
+        try:
+            page = await self._context.new_page()
+        except BaseException:
+            self._pages.release()
+            raise
+        limited = LimitedPage(page, self)
+        self._open_pages.add(limited)
+        return limited
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self._context.close()
+        finally:
+            # Closing a context closes its pages, so free any slot still held.
+            for page in list(self._open_pages):
+                page._release()
+            self._contexts.release()
+
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+
+class LimitedPage:
+    def __init__(self, page, context: LimitedContext):
+        self._page = page
+        self._context = context
+        self._released = False
+
+    async def close(self) -> None:
+        try:
+            await self._page.close()
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._context._open_pages.discard(self)
+        self._context._pages.release()
+
+    def __getattr__(self, name):
+        return getattr(self._page, name)
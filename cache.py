@@ -6,6 +6,7 @@ from sources.base import Item
 
 logger = logging.getLogger(__name__)
 
+CACHE_DIR = Path("cache")
 CACHE_TTL_HOURS = 24
 
 
@@ -43,3 +44,17 @@ def mark_seen(items: list[Item], cache_file: Path) -> None:
         data[item.id] = now
     cache_file.parent.mkdir(parents=True, exist_ok=True)
     cache_file.write_text(json.dumps(data, indent=2))
+
+
+def load_state(name: str) -> dict:
+    """Return the persisted state a module stored under `name`, or {} if none."""
+    return _load(CACHE_DIR / f"{name}.json")
+
+
+def save_state(name: str, data: dict) -> None:
+    """Persist `data` under `name`, replacing the file atomically."""
+    state_file = CACHE_DIR / f"{name}.json"
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = state_file.with_suffix(".json.tmp")
+    tmp_file.write_text(json.dumps(data, indent=2))
+    tmp_file.replace(state_file)
@@ -0,0 +1,43 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) seconds, applied to every request that does not set its own.
+DEFAULT_TIMEOUT = (5, 30)
+# Hosts kept in the pool, and idle keep-alive connections kept per host.
+POOL_HOSTS = 16
+POOL_CONNECTIONS_PER_HOST = 16
+
+
+class _TimeoutAdapter(HTTPAdapter):
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = DEFAULT_TIMEOUT
+        return super().send(request, timeout=timeout, **kwargs)
+
+
+# One adapter, so one set of per-host connection pools, shared by every thread.
+# urllib3 pools are thread-safe; Sessions (cookies, default headers) are not,
+# so each thread gets its own Session mounted on the shared adapter.
+_adapter = _TimeoutAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_CONNECTIONS_PER_HOST)
+_local = threading.local()
+
+
+def session() -> requests.Session:
+    """Return this thread's Session on the shared keep-alive pools."""
+    s = getattr(_local, "session", None)
+    if s is None:
+        s = requests.Session()
+        s.mount("https://", _adapter)
+        s.mount("http://", _adapter)
+        _local.session = s
+    return s
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return session().get(url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return session().post(url, **kwargs)
@@ -1,24 +1,296 @@
-import requests
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+
+import cache
+import http_client
+import scheduler
 from sources.base import Item
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESPONSE_CACHE_TTL_HOURS = 24
+DEFAULT_RESPONSE_CACHE_MAX_ENTRIES = 500
+
+# Context window assumed when ollama.num_ctx is not set (Ollama's default).
+DEFAULT_NUM_CTX = 4096
+# Tokens kept free in the context for the generated summary.
+DEFAULT_RESPONSE_TOKENS = 512
+DEFAULT_MAX_PARALLEL_CHUNKS = 4
+# Ollama requests in flight at once; match the server's OLLAMA_NUM_PARALLEL.
+DEFAULT_MAX_PARALLEL = 1
+_CHARS_PER_TOKEN = 4
+_MIN_CHUNK_TOKENS = 256
+_MAX_REDUCE_ROUNDS = 3
+
+REDUCE_PROMPT = (
+    "The following are partial summaries of one batch of content, produced with "
+    "the instructions below. Combine them into a single response that follows "
+    "the same instructions, merging duplicates and keeping every distinct fact.\n\n"
+    "Instructions: {prompt}"
+)
+
+BATCH_PROMPT = (
+    "{prompt}\n\n"
+    "Apply the instructions above to each item below separately. Items start "
+    "with a line like \"=== ITEM 1 ===\". Answer with one section per item, in "
+    "the same order, each starting with that same marker line, and nothing "
+    "before the first marker."
+)
+_BATCH_MARKER = "=== ITEM {n} ==="
+_BATCH_MARKER_RE = re.compile(r"^\W*=+\s*ITEM\s+(\d+)\s*=+\W*$", re.MULTILINE | re.IGNORECASE)
+
+
+class BatchParseError(ValueError):
+    """A batched response could not be split back into one summary per item."""
+
 
 def summarize(items: list[Item], prompt: str, config: dict, source_cfg: dict | None = None) -> str:
-    content = "\n\n".join(item.content for item in items)
-    full_prompt = f"{prompt}\n\n{content}"
+    """Summarize items with `prompt`, map-reducing input too big for the context.
+
+    Items that fit within the context window go out in one request. Otherwise
+    they are packed into chunks that fit, the chunks are summarized
+    concurrently, and the partial summaries are combined with REDUCE_PROMPT
+    (in further rounds if they still do not fit). No input is dropped.
+    """
+    options = {}
+    if "num_ctx" in config:
+        options["num_ctx"] = config["num_ctx"]
+    if source_cfg and "temperature" in source_cfg:
+        options["temperature"] = source_cfg["temperature"]
+    priority = (source_cfg or {}).get("priority", 0)
+
+    chunks = _pack([item.content for item in items], _input_budget(prompt, config))
+    if len(chunks) == 1:
+        return generate(f"{prompt}\n\n{chunks[0]}", config, options, priority)
+
+    logger.info("Input exceeds the context window, summarizing %d chunks", len(chunks))
+    partials = _generate_all(
+        [f"{prompt}\n\n{chunk}" for chunk in chunks], config, options, priority
+    )
+    reduce_prompt = REDUCE_PROMPT.format(prompt=prompt)
+    budget = _input_budget(reduce_prompt, config)
+    chunks = _pack(partials, budget)
+    for _ in range(_MAX_REDUCE_ROUNDS):
+        if len(chunks) == 1:
+            break
+        partials = _generate_all(
+            [f"{reduce_prompt}\n\n{chunk}" for chunk in chunks], config, options, priority
+        )
+        chunks = _pack(partials, budget)
+    return generate(f"{reduce_prompt}\n\n" + "\n\n".join(chunks), config, options, priority)
 
-    payload = {"model": config["model"], "prompt": full_prompt, "stream": False}
+
+def summarize_batch(
+    items: list[Item], prompt: str, config: dict, source_cfg: dict | None = None
+) -> dict[str, str]:
+    """Summarize several items in one request; return {item.id: summary}.
+
+    Items are numbered with marker lines and the model is asked to answer
+    in the same format. Raises BatchParseError if any item's section is
+    missing or empty, so the caller can fall back to per-item calls.
+    """
     options = {}
     if "num_ctx" in config:
         options["num_ctx"] = config["num_ctx"]
     if source_cfg and "temperature" in source_cfg:
         options["temperature"] = source_cfg["temperature"]
+    priority = (source_cfg or {}).get("priority", 0)
+
+    body = "\n\n".join(
+        f"{_BATCH_MARKER.format(n=n)}\n{item.content}" for n, item in enumerate(items, start=1)
+    )
+    response = generate(f"{BATCH_PROMPT.format(prompt=prompt)}\n\n{body}", config, options, priority)
+
+    sections = {}
+    markers = list(_BATCH_MARKER_RE.finditer(response))
+    for marker, following in zip(markers, markers[1:] + [None]):
+        end = following.start() if following is not None else len(response)
+        sections[int(marker.group(1))] = response[marker.end():end].strip()
+    missing = [n for n in range(1, len(items) + 1) if not sections.get(n)]
+    if missing:
+        raise BatchParseError(f"no summary for item(s) {missing} of {len(items)}")
+    return {item.id: sections[n] for n, item in enumerate(items, start=1)}
+
+
+def batch_items(items: list[Item], prompt: str, config: dict, batch_size: int) -> list[list[Item]]:
+    """Group items into batches of up to `batch_size` that fit one request.
+
+    Every item in a batch gets its own `response_tokens` of room for its
+    summary. An item too large to share the context with others gets a batch
+    of its own (summarize() then chunks it as needed).
+    """
+    available = config.get("num_ctx", DEFAULT_NUM_CTX) - estimate_tokens(
+        BATCH_PROMPT.format(prompt=prompt)
+    )
+    response_tokens = config.get("response_tokens", DEFAULT_RESPONSE_TOKENS)
+    batches = []
+    current: list[Item] = []
+    used = 0
+    for item in items:
+        tokens = estimate_tokens(f"{_BATCH_MARKER.format(n=len(current) + 1)}\n{item.content}")
+        needed = used + tokens + response_tokens * (len(current) + 1)
+        if current and (len(current) >= batch_size or needed > available):
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting; ~4 characters per token for English."""
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+def _input_budget(prompt: str, config: dict) -> int:
+    """Tokens left for content once the prompt and the response are accounted for."""
+    num_ctx = config.get("num_ctx", DEFAULT_NUM_CTX)
+    budget = num_ctx - estimate_tokens(prompt) - config.get(
+        "response_tokens", DEFAULT_RESPONSE_TOKENS
+    )
+    return max(budget, _MIN_CHUNK_TOKENS)
+
+
+def _pack(texts: list[str], budget: int) -> list[str]:
+    """Greedily pack texts into "\n\n"-joined chunks of at most `budget` tokens.
+
+    A text too large for one chunk is split at line or word boundaries.
+    """
+    max_chars = budget * _CHARS_PER_TOKEN
+    chunks = []
+    current = ""
+    for text in texts:
+        for piece in _split_text(text, max_chars):
+            candidate = f"{current}\n\n{piece}" if current else piece
+            if current and estimate_tokens(candidate) > budget:
+                chunks.append(current)
+                candidate = piece
+            current = candidate
+    chunks.append(current)
+    return chunks
+
+
+def _split_text(text: str, max_chars: int) -> list[str]:
+    pieces = []
+    while len(text) > max_chars:
+        cut = text.rfind("\n", 0, max_chars)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(text[:cut])
+        text = text[cut:].lstrip()
+    pieces.append(text)
+    return pieces
+
+
+def _generate_all(
+    prompts: list[str], config: dict, options: dict, priority: int
+) -> list[str]:
+    workers = min(len(prompts), config.get("max_parallel_chunks", DEFAULT_MAX_PARALLEL_CHUNKS))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda prompt: generate(prompt, config, options, priority), prompts))
+
+
+def generate(
+    prompt: str, config: dict, options: dict | None = None, priority: int = 0
+) -> str:
+    """Run one Ollama generation and return its text.
+
+    Responses are cached on disk keyed by a hash of the model, prompt and
+    options, so identical input is answered without calling Ollama. Requests
+    wait in the process-wide scheduler for one of `max_parallel` slots, higher
+    `priority` first; the timeout only starts once the request is sent.
+    """
+    payload = {"model": config["model"], "prompt": prompt, "stream": False}
     if options:
         payload["options"] = options
 
-    response = requests.post(
-        f"{config['base_url']}/api/generate",
-        json=payload,
-        timeout=config.get("timeout", 120),
+    response_cache = _response_cache(config)
+    key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    if response_cache is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            logger.info("Using cached LLM response %s", key[:12])
+            return cached
+
+    with scheduler.ollama.slot(config.get("max_parallel", DEFAULT_MAX_PARALLEL), priority):
+        response = http_client.post(
+            f"{config['base_url']}/api/generate",
+            json=payload,
+            timeout=config.get("timeout", 120),
+        )
+        response.raise_for_status()
+        text = response.json()["response"]
+    if response_cache is not None:
+        response_cache.put(key, text)
+    return text
+
+
+def _response_cache(config: dict) -> "_ResponseCache | None":
+    if not config.get("response_cache", True):
+        return None
+    return _ResponseCache(
+        cache.CACHE_DIR / "llm",
+        ttl_hours=config.get("response_cache_ttl_hours", DEFAULT_RESPONSE_CACHE_TTL_HOURS),
+        max_entries=config.get("response_cache_max_entries", DEFAULT_RESPONSE_CACHE_MAX_ENTRIES),
     )
-    response.raise_for_status()
-    return response.json()["response"]
+
+
+class _ResponseCache:
+    """LLM responses stored as <key>.json files, expired by mtime.
+
+    One file per entry, each written atomically, so concurrent summaries
+    never contend on a shared file.
+    """
+
+    def __init__(self, directory: Path, ttl_hours: float, max_entries: int):
+        self._dir = directory
+        self._ttl_seconds = ttl_hours * 3600
+        self._max_entries = max_entries
+
+    def get(self, key: str) -> str | None:
+        path = self._dir / f"{key}.json"
+        try:
+            if time.time() - path.stat().st_mtime > self._ttl_seconds:
+                return None
+            return json.loads(path.read_text())["response"]
+        except (OSError, json.JSONDecodeError, KeyError, TypeError):
+            return None
+
+    def put(self, key: str, text: str) -> None:
+        path = self._dir / f"{key}.json"
+        try:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{time.monotonic_ns()}.tmp")
+            tmp_path.write_text(json.dumps({"response": text}))
+            tmp_path.replace(path)
+        except OSError as e:
+            logger.warning("Failed to write LLM response cache entry: %s", e)
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        """Drop expired entries, then the oldest ones beyond max_entries."""
+        cutoff = time.time() - self._ttl_seconds
+        entries = []
+        for path in self._dir.glob("*.json"):
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            if mtime < cutoff:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((mtime, path))
+        entries.sort()
+        for _, path in entries[: max(0, len(entries) - self._max_entries)]:
+            path.unlink(missing_ok=True)
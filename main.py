@@ -1,16 +1,18 @@
+import asyncio
 import concurrent.futures
 import logging
 import sys
 from pathlib import Path
 
-import requests
-from playwright.sync_api import sync_playwright
 from requests.exceptions import Timeout
 
+import browser
 import cache
 import composer
 import config
+import http_client
 import llm
+import renderer
 import sources.calendar as calendar_source
 import sources.email as email_source
 import sources.news
@@ -22,8 +24,6 @@ import telegram
 logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
 logger = logging.getLogger(__name__)
 
-CACHE_DIR = Path("cache")
-
 SOURCE_MODULES = {
     "weather": sources.weather,
     "email": email_source,
@@ -33,7 +33,8 @@ SOURCE_MODULES = {
 }
 
 BROWSER_SOURCES = {"news", "twitter"}
-
+# News items summarized per LLM request; 1 keeps one request per article.
+DEFAULT_NEWS_BATCH_SIZE = 1
 
 
 def _run_source(source_name: str, source_cfg: dict, ollama_cfg: dict) -> tuple[str, str] | None:
@@ -51,35 +52,171 @@ def _run_source(source_name: str, source_cfg: dict, ollama_cfg: dict) -> tuple[s
         logger.error("Source '%s' failed: %s", source_name, e)
         return None
 
+    return _summarize_source(source_name, source_cfg, items, ollama_cfg)
+
+
+def _summarize_source(
+    source_name: str, source_cfg: dict, items: list, ollama_cfg: dict
+) -> tuple[str, str] | None:
+    """Filter fetched items through the cache, summarize them and mark them seen.
+
+    Returns (source_name, summary) on success, None to skip.
+    """
     if source_cfg.get("cache", True):
-        cache_file = CACHE_DIR / f"{source_name}.json"
+        cache_file = cache.CACHE_DIR / f"{source_name}.json"
         new_items = cache.filter_new(items, cache_file)
         if not new_items:
             logger.info("No new items from '%s', skipping", source_name)
+            _commit_source(source_name, items)
             return None
     else:
         new_items = items
         cache_file = None
 
+    # Items filter_new dropped were handled by an earlier run.
+    new_ids = {item.id for item in new_items}
+    cached_items = [item for item in items if item.id not in new_ids]
+    seen_items = new_items
     try:
-        summary = llm.summarize(new_items, source_cfg["prompt"], ollama_cfg, source_cfg)
+        if source_cfg.get("render") == "template":
+            # Structured sources can skip the LLM entirely.
+            summary = renderer.render(new_items, source_name, source_cfg)
+        elif source_name == "news":
+            batches = llm.batch_items(
+                new_items,
+                source_cfg["prompt"],
+                ollama_cfg,
+                source_cfg.get("batch_size", DEFAULT_NEWS_BATCH_SIZE),
+            )
+            # Queue every batch at once; the LLM scheduler decides how many run.
+            workers = min(len(batches), ollama_cfg.get("max_parallel", llm.DEFAULT_MAX_PARALLEL))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+                futures = [
+                    pool.submit(_summarize_news_batch, batch, source_cfg, ollama_cfg)
+                    for batch in batches
+                ]
+            per_item_summaries = []
+            seen_items = []
+            for future in futures:
+                for item, item_summary in future.result():
+                    per_item_summaries.append(item_summary)
+                    seen_items.append(item)
+            if not per_item_summaries:
+                return None
+            summary = "\n\n".join(per_item_summaries)
+        else:
+            summary = llm.summarize(new_items, source_cfg["prompt"], ollama_cfg, source_cfg)
     except Timeout:
         logger.warning("LLM timed out for source '%s', skipping", source_name)
         return None
     except Exception as e:
-        logger.error("LLM summarize failed for source '%s': %s", source_name, e)
+        logger.error("Summarizing source '%s' failed: %s", source_name, e)
         return None
 
-    if source_cfg.get("cache", True) and cache_file is not None:
-        cache.mark_seen(new_items, cache_file)
+    if cache_file is not None:
+        cache.mark_seen(seen_items, cache_file)
+    _commit_source(source_name, cached_items + seen_items)
 
     return source_name, summary
 
+
+def _commit_source(source_name: str, seen_items: list) -> None:
+    """Let a source persist its sync state now that `seen_items` are handled.
+
+    Sources that remember how far they got (UIDs, high-water marks, page
+    validators) define `commit(items)` and only advance for items passed here,
+    so anything whose summary failed is fetched again next run. `seen_items`
+    includes fetched items that were already in the seen cache.
+    """
+    commit = getattr(SOURCE_MODULES.get(source_name), "commit", None)
+    if commit is None:
+        return
+    try:
+        commit(seen_items)
+    except Exception as e:
+        logger.warning("Failed to save sync state for '%s': %s", source_name, e)
+
+
+def _summarize_news_batch(batch: list, source_cfg: dict, ollama_cfg: dict) -> list[tuple]:
+    """Summarize a batch of news items; return (item, summary) for each success.
+
+    A batch of several items is sent as one request. If its response cannot
+    be split per item, the items are summarized one by one instead.
+    """
+    if len(batch) > 1:
+        try:
+            summaries = llm.summarize_batch(batch, source_cfg["prompt"], ollama_cfg, source_cfg)
+            return [(item, summaries[item.id]) for item in batch]
+        except llm.BatchParseError as e:
+            logger.warning("Could not split batched news summary (%s), retrying per item", e)
+        except Timeout:
+            logger.warning("LLM timed out for a batch of %d news items, skipping", len(batch))
+            return []
+        except Exception as e:
+            logger.error("LLM summarize failed for a batch of %d news items: %s", len(batch), e)
+            return []
+
+    results = []
+    for item in batch:
+        try:
+            results.append(
+                (item, llm.summarize([item], source_cfg["prompt"], ollama_cfg, source_cfg))
+            )
+        except Timeout:
+            logger.warning("LLM timed out for news item %s, skipping", item.id)
+        except Exception as e:
+            logger.error("LLM summarize failed for news item %s: %s", item.id, e)
+    return results
+
+
+def _run_browser_sources(
+    browser_sources: dict[str, dict],
+    browser_cfg: dict,
+    ollama_cfg: dict,
+    executor: concurrent.futures.Executor,
+) -> dict[str, str]:
+    """Scrape every browser source concurrently on one Chromium instance.
+
+    Runs on a worker thread so the browser launch and scraping overlap with the
+    non-browser sources. Each source's LLM pass is handed back to `executor` as
+    soon as its items are fetched, so summarizing news overlaps with scraping
+    twitter. Returns {source_name: summary} for the sources that produced one.
+    """
+    jobs = {}
+    for source_name, source_cfg in browser_sources.items():
+        if source_name not in SOURCE_MODULES:
+            logger.warning("Unknown source '%s', skipping", source_name)
+            continue
+        jobs[source_name] = (SOURCE_MODULES[source_name].fetch, source_cfg)
+
+    futures = {}
+
+    def on_items(source_name: str, items: list) -> None:
+        future = executor.submit(
+            _summarize_source, source_name, browser_sources[source_name], items, ollama_cfg
+        )
+        futures[future] = source_name
+
+    asyncio.run(browser.fetch_all(jobs, browser_cfg, on_items))
+
+    summaries = {}
+    for future in concurrent.futures.as_completed(futures):
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error("Source '%s' failed: %s", futures[future], e)
+            continue
+        if result is not None:
+            source_name, summary = result
+            summaries[source_name] = summary
+    return summaries
+
+
 def run(config_path: str = "config.yaml") -> None:
     cfg = config.load(Path(config_path))
 
     try:
-        requests.get(cfg["ollama"]["base_url"], timeout=5).raise_for_status()
+        http_client.get(cfg["ollama"]["base_url"], timeout=5).raise_for_status()
     except Exception as e:
         raise RuntimeError(
             f"Ollama is not reachable at {cfg['ollama']['base_url']}: {e}"
@@ -87,13 +224,31 @@ def run(config_path: str = "config.yaml") -> None:
 
     summaries = {}
 
-    # --- Non-browser sources (parallel) ---
-    non_browser = {
+    enabled = {
         name: src_cfg
         for name, src_cfg in cfg["sources"].items()
-        if src_cfg.get("enabled", False) and name not in BROWSER_SOURCES
+        if src_cfg.get("enabled", False)
+    }
+    non_browser = {
+        name: src_cfg for name, src_cfg in enabled.items() if name not in BROWSER_SOURCES
+    }
+    browser_sources = {
+        name: src_cfg for name, src_cfg in enabled.items() if name in BROWSER_SOURCES
     }
+
     with concurrent.futures.ThreadPoolExecutor() as executor:
+        # Browser sources go first so Chromium starts launching while the
+        # non-browser fetches are still in flight.
+        browser_future = None
+        if browser_sources:
+            browser_future = executor.submit(
+                _run_browser_sources,
+                browser_sources,
+                cfg.get("browser", {}),
+                cfg["ollama"],
+                executor,
+            )
+
         futures = {
             executor.submit(_run_source, name, src_cfg, cfg["ollama"]): name
             for name, src_cfg in non_browser.items()
@@ -109,64 +264,11 @@ def run(config_path: str = "config.yaml") -> None:
                 source_name, summary = result
                 summaries[source_name] = summary
 
-    # --- Browser sources (sequential, Playwright) ---
-    with sync_playwright() as pw:
-        browser = pw.chromium.launch(headless=True)
-        cache_file = None
-        for source_name, source_cfg in cfg["sources"].items():
-            if not source_cfg.get("enabled", False):
-                continue
-            if source_name not in BROWSER_SOURCES:
-                continue
-            if source_name not in SOURCE_MODULES:
-                logger.warning("Unknown source '%s', skipping", source_name)
-                continue
+        if browser_future is not None:
             try:
-                items = SOURCE_MODULES[source_name].fetch(source_cfg, browser)
+                summaries.update(browser_future.result())
             except Exception as e:
-                logger.error("Source '%s' failed: %s", source_name, e)
-                continue
-
-            if source_cfg.get("cache", True):
-                cache_file = CACHE_DIR / f"{source_name}.json"
-                new_items = cache.filter_new(items, cache_file)
-                if not new_items:
-                    logger.info("No new items from '%s', skipping", source_name)
-                    continue
-            else:
-                new_items = items
-
-            try:
-                if source_name == "news":
-                    per_item_summaries = []
-                    seen_items = []
-                    for item in new_items:
-                        try:
-                            per_item_summaries.append(
-                                llm.summarize([item], source_cfg["prompt"], cfg["ollama"], source_cfg)
-                            )
-                            seen_items.append(item)
-                        except Timeout:
-                            logger.warning("LLM timed out for news item %s, skipping", item.id)
-                        except Exception as e:
-                            logger.error("LLM summarize failed for news item %s: %s", item.id, e)
-                    if not per_item_summaries:
-                        continue
-                    summary = "\n\n".join(per_item_summaries)
-                else:
-                    summary = llm.summarize(new_items, source_cfg["prompt"], cfg["ollama"], source_cfg)
-            except Timeout:
-                logger.warning("LLM timed out for source '%s', skipping", source_name)
-                continue
-            except Exception as e:
-                logger.error("LLM summarize failed for source '%s': %s", source_name, e)
-                continue
-
-            if source_cfg.get("cache", True):
-                cache.mark_seen(seen_items if source_name == "news" else new_items, cache_file)
-            summaries[source_name] = summary
-
-        browser.close()
+                logger.error("Browser sources failed: %s", e)
 
     if not summaries:
         logger.info("Nothing new across all sources, not sending Telegram message")
@@ -0,0 +1,32 @@
+from sources.base import Item
+
+# Used when a source in render mode has no `template` of its own.
+DEFAULT_TEMPLATES = {
+    "weather": "Now: {tempf}°F, humidity {humidity}%, wind {windspeedmph} mph\nForecast: {forecast}",
+    "calendar": "- {start}: {title}",
+}
+GENERIC_TEMPLATE = "- {content}"
+MISSING_FIELD = "?"
+
+
+class _Fields(dict):
+    def __missing__(self, key):
+        return MISSING_FIELD
+
+
+def render(items: list[Item], source_name: str, source_cfg: dict) -> str:
+    """Format items into a digest section without calling the LLM.
+
+    The template is a str.format string applied to each item, with the item's
+    `data` fields plus `content`, `id`, `source` and `timestamp` available.
+    Unknown fields render as "?". Rendered items are joined with newlines.
+    """
+    template = source_cfg.get("template") or DEFAULT_TEMPLATES.get(source_name, GENERIC_TEMPLATE)
+    lines = []
+    for item in items:
+        fields = _Fields(item.data or {})
+        fields.update(
+            content=item.content, id=item.id, source=item.source, timestamp=item.timestamp
+        )
+        lines.append(template.format_map(fields))
+    return "\n".join(lines)
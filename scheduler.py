@@ -0,0 +1,50 @@
+import contextlib
+import heapq
+import itertools
+import threading
+
+
+class Scheduler:
+    """Hands out a limited number of slots, highest priority first.
+
+    Threads wait in one queue ordered by priority (higher first), then by
+    arrival. The limit is given on each acquire, so it always follows the
+    current config.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._waiting: list[tuple[int, int]] = []
+        self._active = 0
+        self._counter = itertools.count()
+
+    @contextlib.contextmanager
+    def slot(self, limit: int, priority: int = 0):
+        ticket = (-priority, next(self._counter))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            self._cond.wait_for(
+                lambda: self._waiting[0] == ticket and self._active < max(limit, 1)
+            )
+            heapq.heappop(self._waiting)
+            self._active += 1
+            # The next waiter may fit too if the limit allows.
+            self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+
+# Every Ollama request in the process goes through this one scheduler.
+ollama = Scheduler()
@@ -6,3 +6,5 @@ class Item:
     source: str
     content: str
     timestamp: str
+    # Structured fields for template rendering (see renderer.py), if the source has any.
+    data: dict | None = None
@@ -1,40 +1,215 @@
-import requests
-from datetime import datetime, timezone, timedelta
+import concurrent.futures
+import hashlib
+import heapq
+import logging
+
+from datetime import date, datetime, timezone, timedelta
+from dateutil.rrule import rruleset, rrulestr
 from icalendar import Calendar
+
+import cache
+import http_client
 from sources.base import Item
 
+logger = logging.getLogger(__name__)
+
+_HTTP_TIMEOUT = (5, 30)
+# Parsed events are kept this many days past the lookahead window, so later
+# runs can answer from the cache until the window slides past what was parsed.
+_DEFAULT_CACHE_HORIZON_DAYS = 14
+
+# Per-feed HTTP validators, content hash and parsed events from the last download.
+_FEEDS_STATE = "calendar_feeds"
+_VALIDATOR_HEADERS = {"etag": "If-None-Match", "last-modified": "If-Modified-Since"}
+
 
 def fetch(config: dict, browser) -> list[Item]:
-    resp = requests.get(config["ics_url"])
-    resp.raise_for_status()
-    cal = Calendar.from_ical(resp.content)
+    """Fetch every configured feed concurrently and merge their events by time."""
+    urls = config.get("ics_urls") or [config["ics_url"]]
     now = datetime.now(timezone.utc)
     cutoff = now + timedelta(days=config["lookahead_days"])
+    feeds = cache.load_state(_FEEDS_STATE)
+    known_feeds = dict(feeds)
+
+    results = []
+    errors = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(urls)) as pool:
+        futures = {
+            pool.submit(_fetch_feed, url, config, feeds, now, cutoff): url for url in urls
+        }
+        for future, url in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors.append(e)
+                logger.warning("Failed to fetch calendar %s: %s", url, e)
+    if errors and not results:
+        raise errors[0]
+
+    if feeds != known_feeds:
+        cache.save_state(_FEEDS_STATE, feeds)
+
+    # Each feed's events are already in time order, so merge instead of sorting.
+    items = []
+    seen = set()
+    for event in heapq.merge(*results, key=lambda event: event["begin"]):
+        if event["id"] in seen:
+            continue  # the same event shared into several calendars
+        seen.add(event["id"])
+        items.append(
+            Item(
+                id=event["id"],
+                source="calendar",
+                content=event["content"],
+                timestamp=now.isoformat(),
+                data=event.get("data"),
+            )
+        )
+    return items
+
+
+def _fetch_feed(
+    url: str, config: dict, feeds: dict, now: datetime, cutoff: datetime
+) -> list[dict]:
+    """Return the feed's events beginning inside [now, cutoff], in time order.
+
+    Updates `feeds[url]` when the feed had to be downloaded again.
+    """
+    feed = dict(feeds.get(url, {}))
+    horizon = feed.get("horizon")
+    covered = horizon is not None and datetime.fromisoformat(horizon) >= cutoff
+    headers = {}
+    if covered:
+        headers = {
+            request_header: feed[name]
+            for name, request_header in _VALIDATOR_HEADERS.items()
+            if feed.get(name)
+        }
+    resp = http_client.get(url, headers=headers, timeout=config.get("timeout", _HTTP_TIMEOUT))
+    if resp.status_code == 304 and covered:
+        logger.info("Calendar not modified since last run: %s", url)
+        events = feed["events"]
+    else:
+        resp.raise_for_status()
+        digest = hashlib.sha256(resp.content).hexdigest()
+        if covered and digest == feed.get("sha256"):
+            events = feed["events"]
+        else:
+            horizon = cutoff + timedelta(
+                days=config.get("cache_horizon_days", _DEFAULT_CACHE_HORIZON_DAYS)
+            )
+            events = _parse_events(resp.content, now, horizon)
+            feed = {"horizon": horizon.isoformat(), "events": events}
+        feed["sha256"] = digest
+        for name in _VALIDATOR_HEADERS:
+            if resp.headers.get(name):
+                feed[name] = resp.headers[name]
+            else:
+                feed.pop(name, None)
+        feeds[url] = feed
+
+    return [
+        event for event in events if now <= datetime.fromisoformat(event["begin"]) <= cutoff
+    ]
+
+
+def _parse_events(ics: bytes, start: datetime, end: datetime) -> list[dict]:
+    """Parse the events beginning between `start` and `end`, in time order.
+
+    Recurring events are expanded inside the window only. EXDATEs are skipped,
+    RDATEs added, and occurrences moved or cancelled by a RECURRENCE-ID
+    override are replaced by that override.
+    """
+    cal = Calendar.from_ical(ics)
+    vevents = [c for c in cal.walk() if c.name == "VEVENT" and c.get("dtstart") is not None]
+    overridden = {
+        (str(c.get("uid", "")), _to_utc(c["recurrence-id"].dt))
+        for c in vevents
+        if c.get("recurrence-id") is not None
+    }
+
     events = []
-    for comp in cal.walk():
-        if comp.name != "VEVENT":
+    for comp in vevents:
+        uid = str(comp.get("uid", ""))
+        if str(comp.get("status", "")).upper() == "CANCELLED":
             continue
-        dtstart = comp.get("dtstart")
-        if dtstart is None:
-            continue
-        begin = dtstart.dt
-        if not hasattr(begin, "hour"):
-            # date-only event: convert to datetime at midnight UTC
-            begin = datetime(begin.year, begin.month, begin.day, tzinfo=timezone.utc)
-        if begin.tzinfo is None:
-            begin = begin.replace(tzinfo=timezone.utc)
-        if now <= begin <= cutoff:
-            name = str(comp.get("summary", ""))
-            uid = str(comp.get("uid", ""))
-            description = comp.get("description")
+        if comp.get("recurrence-id") is not None:
+            occurrence = _to_utc(comp["recurrence-id"].dt)
+            occurrences = [(f"{uid}/{occurrence.isoformat()}", _to_utc(comp["dtstart"].dt))]
+        elif comp.get("rrule") is not None:
+            occurrences = [
+                (f"{uid}/{begin.isoformat()}", begin)
+                for begin in _expand(comp, start, end)
+                if (uid, begin) not in overridden
+            ]
+        else:
+            occurrences = [(uid, _to_utc(comp["dtstart"].dt))]
+
+        name = str(comp.get("summary", ""))
+        description = comp.get("description")
+        for event_id, begin in occurrences:
+            if not start <= begin <= end:
+                continue
             content = f"{name}\n{begin.strftime('%Y-%m-%d %H:%M UTC')}"
             if description:
                 content += f"\n{str(description)}"
-            events.append((begin, Item(
-                id=uid,
-                source="calendar",
-                content=content,
-                timestamp=now.isoformat(),
-            )))
+            data = {
+                "title": name,
+                "start": begin.strftime("%a %d %b %H:%M UTC"),
+                "description": str(description or ""),
+            }
+            events.append(
+                (begin, {"begin": begin.isoformat(), "id": event_id, "content": content, "data": data})
+            )
     events.sort(key=lambda t: t[0])
-    return [item for _, item in events]
+    return [event for _, event in events]
+
+
+def _expand(comp, start: datetime, end: datetime) -> list[datetime]:
+    """Occurrence start times (UTC) of a recurring VEVENT between start and end.
+
+    Rules are expanded in the event's own wall-clock time, so a weekly 09:00
+    meeting stays at 09:00 across DST changes.
+    """
+    dtstart = comp["dtstart"].dt
+    tz = getattr(dtstart, "tzinfo", None) or timezone.utc
+
+    def local(value) -> datetime:
+        if not hasattr(value, "hour"):
+            return datetime(value.year, value.month, value.day)
+        if value.tzinfo is not None:
+            value = value.astimezone(tz)
+        return value.replace(tzinfo=None)
+
+    rules = rruleset()
+    for rule in _as_list(comp.get("rrule")):
+        rule = rule.copy()
+        if "UNTIL" in rule:
+            # dateutil wants UNTIL in the same (naive) terms as DTSTART.
+            rule["UNTIL"] = [local(value) for value in rule["UNTIL"]]
+        rules.rrule(rrulestr(rule.to_ical().decode(), dtstart=local(dtstart)))
+    for prop, add in (("exdate", rules.exdate), ("rdate", rules.rdate)):
+        for value in _as_list(comp.get(prop)):
+            for dt in value.dts:
+                if not isinstance(dt.dt, tuple):  # RDATE periods are not supported
+                    add(local(dt.dt))
+
+    return [
+        _to_utc(begin.replace(tzinfo=tz))
+        for begin in rules.between(local(start), local(end), inc=True)
+    ]
+
+
+def _to_utc(value: date | datetime) -> datetime:
+    if not hasattr(value, "hour"):
+        # date-only event: midnight UTC
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
@@ -1,43 +1,555 @@
-import imaplib
+import base64
+import binascii
+import concurrent.futures
 import email as stdlib_email
+import hashlib
+import imaplib
+import logging
+import queue
+import quopri
+import re
+import threading
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from email import policy as email_policy
+from html.parser import HTMLParser
+
+import cache
 from sources.base import Item
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BODY_BYTES = 20000
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 2
+# Per mailbox UIDVALIDITY and the last UID fetched, so each run only asks for
+# mail that arrived since the previous one.
+_STATE_NAME = "email_state"
+# UID state from the last fetch(), saved by commit() once its items are seen.
+_pending: dict | None = None
+_HEADER_FIELDS = "MESSAGE-ID SUBJECT FROM DATE REFERENCES IN-REPLY-TO"
+_MESSAGE_ID_RE = re.compile(r"<[^<>\s]+>")
+_ORIGINAL_MESSAGE_RE = re.compile(r"^-{2,}\s*Original Message\s*-{2,}$", re.IGNORECASE)
+_TOKEN_RE = re.compile(
+    rb'\s*(?:(?P<open>\()|(?P<close>\))|"(?P<quoted>(?:[^"\\]|\\.)*)"'
+    rb"|\{(?P<literal>\d+)\}$|(?P<atom>[^\s()\"{}\[\]]+(?:\[[^\]]*\](?:<\d+>)?)?))"
+)
+
 
 def fetch(config: dict, browser) -> list[Item]:
-    imap = imaplib.IMAP4_SSL(config["host"], config["port"])
+    """Fetch unread mail from every configured account and mailbox.
+
+    Mailboxes are fetched concurrently, with at most `max_connections_per_host`
+    connections open to any one server. Each connection logs in once and then
+    works through the account's folders with SELECT.
+    """
+    accounts = _accounts(config)
+    per_host = config.get("max_connections_per_host", DEFAULT_MAX_CONNECTIONS_PER_HOST)
+    host_limits = {account["host"]: threading.Semaphore(per_host) for account in accounts}
+    state = cache.load_state(_STATE_NAME)
+    known_state = {key: dict(value) for key, value in state.items()}
+
+    workers = []
+    for account in accounts:
+        mailboxes = queue.SimpleQueue()
+        for mailbox in account["mailboxes"]:
+            mailboxes.put(mailbox)
+        for _ in range(min(per_host, len(account["mailboxes"]))):
+            workers.append((account, mailboxes))
+
+    results = []
+    errors = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(workers)) as pool:
+        futures = [
+            pool.submit(_sync_mailboxes, account, mailboxes, host_limits[account["host"]], state)
+            for account, mailboxes in workers
+        ]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors.append(e)
+    if errors and not results:
+        raise errors[0]
+    for error in errors:
+        logger.warning("Email connection failed: %s", error)
+
+    # The same message can sit in several folders (e.g. Gmail labels).
+    messages = {}
+    for worker_messages in results:
+        for message in worker_messages:
+            messages.setdefault(message.message_id, message)
+    items = _thread_items(list(messages.values()))
+
+    global _pending
+    _pending = None
+    if state != known_state:
+        _pending = {"state": state, "item_ids": {item.id for item in items}}
+    return items
+
+
+def commit(items: list[Item]) -> None:
+    """Save the UIDs reached by the last fetch() once its items are seen.
+
+    main calls this after summarizing and marking `items` seen. If any fetched
+    item is missing because its summary failed, the UIDs are not advanced, so
+    the next run fetches that mail again.
+    """
+    global _pending
+    pending, _pending = _pending, None
+    if pending is not None and pending["item_ids"] <= {item.id for item in items}:
+        cache.save_state(_STATE_NAME, pending["state"])
+
+
+def _accounts(config: dict) -> list[dict]:
+    """Expand the config into accounts, each with a list of `mailboxes`.
+
+    Entries under `accounts` inherit any setting they leave out from the
+    top level, so a single-account config needs no `accounts` list at all.
+    """
+    defaults = {key: value for key, value in config.items() if key != "accounts"}
+    accounts = []
+    for entry in config.get("accounts") or [{}]:
+        account = {**defaults, **entry}
+        if "mailboxes" in entry or "mailbox" in entry:
+            mailboxes = entry.get("mailboxes") or [entry["mailbox"]]
+        else:
+            mailboxes = config.get("mailboxes") or [config.get("mailbox", "INBOX")]
+        account["mailboxes"] = mailboxes
+        account.setdefault("port", 993)
+        accounts.append(account)
+    return accounts
+
+
+def _sync_mailboxes(
+    account: dict, mailboxes: queue.SimpleQueue, host_limit: threading.Semaphore, state: dict
+) -> list["_Message"]:
+    """Fetch mailboxes from the shared queue over one authenticated connection."""
+    items = []
+    with host_limit:
+        if mailboxes.empty():
+            return items  # other connections already took every folder
+        imap = imaplib.IMAP4_SSL(account["host"], account["port"])
+        try:
+            imap.login(account["username"], account["password"])
+            while True:
+                try:
+                    mailbox = mailboxes.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    items.extend(_fetch_mailbox(imap, account, mailbox, state))
+                except imaplib.IMAP4.abort:
+                    raise  # the connection is gone
+                except Exception as e:
+                    logger.warning(
+                        "Failed to fetch mailbox %s for %s: %s", mailbox, account["username"], e
+                    )
+        finally:
+            try:
+                imap.logout()
+            except Exception:
+                pass
+    return items
+
+
+def _fetch_mailbox(imap, account: dict, mailbox: str, state: dict) -> list["_Message"]:
+    imap.select(mailbox, readonly=True)
+    uidvalidity = _untagged_value(imap, "UIDVALIDITY")
+    uidnext = _untagged_value(imap, "UIDNEXT")
+
+    state_key = f"{account['username']}@{account['host']}/{mailbox}"
+    mailbox_state = state.get(state_key, {})
+    last_uid = 0
+    if uidvalidity is not None and mailbox_state.get("uidvalidity") == uidvalidity:
+        last_uid = mailbox_state.get("last_uid", 0)
+
+    criteria = ["UNSEEN"]
+    if last_uid:
+        criteria.append(f"UID {last_uid + 1}:*")
+    status, data = imap.uid("SEARCH", None, *criteria)
+    uids = []
+    if status == "OK" and data[0]:
+        # "n:*" always matches the newest message, even when its UID < n.
+        uids = [uid for uid in data[0].split() if int(uid) > last_uid]
+
+    items = []
+    if uids:
+        items = _fetch_messages(
+            imap, uids, account.get("max_body_bytes", DEFAULT_MAX_BODY_BYTES)
+        )
+
+    if uidvalidity is not None:
+        # Everything below UIDNEXT existed at SELECT time and was searched.
+        newest = max([last_uid, *(int(uid) for uid in uids)])
+        if uidnext is not None:
+            newest = max(newest, int(uidnext) - 1)
+        state[state_key] = {"uidvalidity": uidvalidity, "last_uid": newest}
+    return items
+
+
+def _untagged_value(imap, name: str) -> str | None:
+    _, data = imap.response(name)
+    if not data or data[0] is None:
+        return None
+    return _text(data[0]).strip()
+
+
+def _fetch_messages(imap, uids: list[bytes], max_body_bytes: int) -> list["_Message"]:
+    """Fetch headers and one capped text body per message in two batched rounds.
+
+    The first UID FETCH returns the headers and BODYSTRUCTURE of every message;
+    the second pulls only the chosen text part of each, up to `max_body_bytes`.
+    Attachments are never downloaded, and PEEK leaves messages unread.
+    """
+    _, data = imap.uid(
+        "FETCH",
+        _message_set(uids),
+        f"(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({_HEADER_FIELDS})])",
+    )
+    messages = _parse_fetch_response(data)
+
+    parts_by_section: dict[str, list[bytes]] = {}
+    text_parts = {}
+    for uid, attrs in messages.items():
+        part = _find_text_part(attrs.get("BODYSTRUCTURE"))
+        if part is not None:
+            text_parts[uid] = part
+            parts_by_section.setdefault(part[0], []).append(uid)
+
+    bodies: dict[bytes, bytes] = {}
+    for section, section_uids in parts_by_section.items():
+        _, data = imap.uid(
+            "FETCH",
+            _message_set(section_uids),
+            f"(UID BODY.PEEK[{section}]<0.{max_body_bytes}>)",
+        )
+        for uid, attrs in _parse_fetch_response(data).items():
+            body = _find_attr(attrs, f"BODY[{section}]")
+            if isinstance(body, bytes):
+                bodies[uid] = body
+
+    items = []
+    for msg_id in uids:
+        attrs = messages.get(msg_id)
+        if attrs is None:
+            continue
+        headers = stdlib_email.message_from_bytes(
+            _find_attr(attrs, "BODY[HEADER.FIELDS") or b"", policy=email_policy.default
+        )
+        body = ""
+        if msg_id in text_parts and msg_id in bodies:
+            _, encoding, charset, subtype = text_parts[msg_id]
+            body = _decode_body(bodies[msg_id], encoding, charset)
+            if subtype == "html":
+                body = _html_to_text(body)
+        items.append(_make_message(headers, msg_id, body))
+    return items
+
+
+@dataclass
+class _Message:
+    message_id: str
+    subject: str
+    sender: str
+    date: datetime | None
+    related_ids: list[str]
+    body: str
+
+
+def _make_message(headers, msg_id: bytes, body: str) -> _Message:
+    related_ids = _MESSAGE_ID_RE.findall(
+        f"{headers.get('References', '')} {headers.get('In-Reply-To', '')}"
+    )
     try:
-        imap.login(config["username"], config["password"])
-        imap.select(config["mailbox"])
-        status, data = imap.search(None, "UNSEEN")
-        if status != "OK" or not data[0]:
-            return []
-        ids = data[0].split()
-        return [_fetch_message(imap, msg_id) for msg_id in ids]
-    finally:
-        imap.logout()
-
-
-def _fetch_message(imap, msg_id: bytes) -> Item:
-    _, data = imap.fetch(msg_id, "(RFC822)")
-    raw = data[0][1]
-    msg = stdlib_email.message_from_bytes(raw)
-    message_id = msg.get("Message-ID", msg_id.decode())
-    subject = msg.get("Subject", "(no subject)")
-    sender = msg.get("From", "unknown")
-    body = _extract_body(msg)
-    content = f"From: {sender}\nSubject: {subject}\n\n{body}"
-    return Item(
-        id=message_id,
-        source="email",
-        content=content,
-        timestamp=datetime.now(timezone.utc).isoformat(),
+        date = headers["Date"].datetime if headers["Date"] else None
+    except (AttributeError, TypeError, ValueError):
+        date = None
+    return _Message(
+        message_id=str(headers.get("Message-ID", msg_id.decode())).strip(),
+        subject=str(headers.get("Subject", "(no subject)")),
+        sender=str(headers.get("From", "unknown")),
+        date=date,
+        related_ids=related_ids,
+        body=_strip_quotes(body),
     )
 
 
-def _extract_body(msg) -> str:
-    if msg.is_multipart():
-        for part in msg.walk():
-            if part.get_content_type() == "text/plain":
-                return part.get_payload(decode=True).decode(errors="replace")
-    return msg.get_payload(decode=True).decode(errors="replace") if msg.get_payload() else ""
+def _thread_items(messages: list[_Message]) -> list[Item]:
+    """Collapse messages linked by References/In-Reply-To into one item per thread.
+
+    A lone message keeps its Message-ID as the item ID; a thread's ID is a hash
+    of its members' IDs, so a new reply yields a new item.
+    """
+    parent = {}
+
+    def find(msg_id: str) -> str:
+        parent.setdefault(msg_id, msg_id)
+        while parent[msg_id] != msg_id:
+            parent[msg_id] = parent[parent[msg_id]]
+            msg_id = parent[msg_id]
+        return msg_id
+
+    for message in messages:
+        for related in message.related_ids:
+            parent[find(related)] = find(message.message_id)
+
+    threads: dict[str, list[_Message]] = {}
+    for message in messages:
+        threads.setdefault(find(message.message_id), []).append(message)
+
+    items = []
+    for members in threads.values():
+        members.sort(key=_message_sort_key)
+        if len(members) == 1:
+            message = members[0]
+            item_id = message.message_id
+            content = f"From: {message.sender}\nSubject: {message.subject}\n\n{message.body}"
+        else:
+            ids = "\n".join(sorted(m.message_id for m in members))
+            item_id = hashlib.sha256(ids.encode()).hexdigest()
+            parts = [f"Subject: {members[0].subject}\nMessages: {len(members)}"]
+            parts += [f"From: {m.sender}\n{m.body}" for m in members]
+            content = "\n\n".join(parts)
+        items.append(
+            Item(
+                id=item_id,
+                source="email",
+                content=content,
+                timestamp=datetime.now(timezone.utc).isoformat(),
+            )
+        )
+    return items
+
+
+def _message_sort_key(message: _Message) -> float:
+    if message.date is None:
+        return float("inf")
+    return message.date.timestamp()
+
+
+def _strip_quotes(body: str) -> str:
+    """Drop quoted reply history and the signature from a message body."""
+    lines = body.splitlines()
+    kept = []
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped == "--":
+            break  # signature delimiter
+        if _ORIGINAL_MESSAGE_RE.match(stripped):
+            break
+        if stripped.startswith("On ") and (
+            stripped.endswith("wrote:")
+            or (index + 1 < len(lines) and lines[index + 1].strip().endswith("wrote:"))
+        ):
+            break  # "On <date>, <sender> wrote:" introduces the quoted reply
+        if stripped.startswith("From:") and index + 1 < len(lines) and (
+            lines[index + 1].strip().startswith("Sent:")
+        ):
+            break  # Outlook-style quoted header block
+        if stripped.startswith(">"):
+            continue
+        kept.append(line)
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip()
+
+
+def _find_attr(attrs: dict, prefix: str):
+    # Servers echo section specs with their own spacing, quoting and <origin>.
+    for key, value in attrs.items():
+        if key.startswith(prefix):
+            return value
+    return None
+
+
+def _message_set(msg_ids: list[bytes]) -> str:
+    """Compress message numbers into an IMAP sequence set, e.g. "1:3,7"."""
+    numbers = sorted(int(i) for i in msg_ids)
+    ranges = []
+    start = prev = numbers[0]
+    for n in numbers[1:]:
+        if n == prev + 1:
+            prev = n
+            continue
+        ranges.append(f"{start}:{prev}" if prev != start else str(start))
+        start = prev = n
+    ranges.append(f"{start}:{prev}" if prev != start else str(start))
+    return ",".join(ranges)
+
+
+def _find_text_part(structure, prefix: str = "") -> tuple[str, str, str, str] | None:
+    """Pick the body part to summarize from a parsed BODYSTRUCTURE.
+
+    Returns (section, transfer_encoding, charset, subtype) for the first
+    text/plain part, else the first text/html part, skipping attachments and
+    encapsulated messages. None if the message has no usable text.
+    """
+    plain, html = _walk_text_parts(structure, prefix)
+    return plain or html
+
+
+def _walk_text_parts(structure, prefix: str):
+    if not isinstance(structure, list) or not structure:
+        return None, None
+    if isinstance(structure[0], list):
+        # multipart: child parts first, then the subtype and extension data
+        plain = html = None
+        children = []
+        for child in structure:
+            if not isinstance(child, list):
+                break  # the subtype; what follows is extension data
+            children.append(child)
+        for index, child in enumerate(children):
+            section = f"{prefix}{index + 1}"
+            child_plain, child_html = _walk_text_parts(child, f"{section}.")
+            plain = plain or child_plain
+            html = html or child_html
+            if plain:
+                break
+        return plain, html
+
+    section = prefix.rstrip(".") or "1"
+    main_type = _lower(structure[0])
+    subtype = _lower(structure[1]) if len(structure) > 1 else ""
+    if main_type != "text" or subtype not in ("plain", "html"):
+        return None, None
+    disposition = structure[9] if len(structure) > 9 else None
+    if isinstance(disposition, list) and _lower(disposition[0]) == "attachment":
+        return None, None
+    params = structure[2] if isinstance(structure[2], list) else []
+    charset = "utf-8"
+    for key, value in zip(params[::2], params[1::2]):
+        if _lower(key) == "charset" and value:
+            charset = _text(value)
+    encoding = _lower(structure[5]) if len(structure) > 5 else "7bit"
+    part = (section, encoding, charset, subtype)
+    return (part, None) if subtype == "plain" else (None, part)
+
+
+def _decode_body(raw: bytes, encoding: str, charset: str) -> str:
+    if encoding == "base64":
+        data = b"".join(raw.split())
+        # A capped fetch can end mid-quantum; drop the incomplete tail.
+        data = data[: len(data) - len(data) % 4]
+        try:
+            raw = base64.b64decode(data)
+        except binascii.Error:
+            raw = b""
+    elif encoding == "quoted-printable":
+        raw = quopri.decodestring(raw)
+    try:
+        return raw.decode(charset, errors="replace")
+    except LookupError:
+        return raw.decode("utf-8", errors="replace")
+
+
+class _TextExtractor(HTMLParser):
+    _SKIPPED = {"script", "style", "head"}
+    _BREAKS = {"br", "p", "div", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self):
+        super().__init__()
+        self.chunks: list[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIPPED:
+            self._skip_depth += 1
+        elif tag in self._BREAKS:
+            self.chunks.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIPPED and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.chunks.append(data)
+
+
+def _html_to_text(html: str) -> str:
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    text = re.sub(r"[ \t\r\f\v]+", " ", "".join(parser.chunks))
+    return re.sub(r"\s*\n\s*", "\n", text).strip()
+
+
+def _parse_fetch_response(data) -> dict[bytes, dict]:
+    """Parse imaplib FETCH data into {uid: {ITEM: value}}.
+
+    Responses are keyed by their UID item, falling back to the message
+    sequence number when the server did not return one.
+
+    imaplib returns a list mixing (prefix, literal) tuples and plain bytes;
+    a prefix ending in {n} is followed by its n-byte literal.
+    """
+    tokens = []
+    for part in data:
+        if isinstance(part, tuple):
+            tokens.extend(_tokenize(part[0], part[1]))
+        elif part:
+            tokens.extend(_tokenize(part, None))
+
+    messages = {}
+    pos = 0
+    while pos < len(tokens):
+        kind, value = tokens[pos]
+        if kind == "atom" and value.isdigit() and pos + 1 < len(tokens) and tokens[pos + 1][0] == "open":
+            attrs, pos = _parse_list(tokens, pos + 1)
+            attrs = {_text(key).upper(): val for key, val in zip(attrs[::2], attrs[1::2])}
+            messages[attrs.get("UID") or value] = attrs
+        else:
+            pos += 1
+    return messages
+
+
+def _tokenize(text: bytes, literal: bytes | None) -> list[tuple[str, object]]:
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if m is None or m.end() == pos:
+            break
+        pos = m.end()
+        if m.group("open"):
+            tokens.append(("open", None))
+        elif m.group("close"):
+            tokens.append(("close", None))
+        elif m.group("quoted") is not None:
+            tokens.append(("value", re.sub(rb"\\(.)", rb"\1", m.group("quoted"))))
+        elif m.group("literal") is not None:
+            tokens.append(("value", literal if literal is not None else b""))
+        else:
+            atom = m.group("atom")
+            tokens.append(("atom", atom))
+    return tokens
+
+
+def _parse_list(tokens: list, pos: int) -> tuple[list, int]:
+    """Parse the parenthesized list opening at tokens[pos]; return (list, next_pos)."""
+    result = []
+    pos += 1
+    while pos < len(tokens):
+        kind, value = tokens[pos]
+        if kind == "close":
+            return result, pos + 1
+        if kind == "open":
+            nested, pos = _parse_list(tokens, pos)
+            result.append(nested)
+            continue
+        if kind == "atom" and value.upper() == b"NIL":
+            result.append(None)
+        else:
+            result.append(value)
+        pos += 1
+    return result, pos
+
+
+def _text(value) -> str:
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")
+    return value or ""
+
+
+def _lower(value) -> str:
+    return _text(value).lower()
@@ -1,45 +1,298 @@
+import asyncio
+import concurrent.futures
 import hashlib
 import logging
-from datetime import datetime, timezone
+import os
+from datetime import datetime, timezone, timedelta
+from urllib.parse import urlsplit
 
 import trafilatura
 
+import cache
+import http_client
 from sources.base import Item
 
 logger = logging.getLogger(__name__)
 
 CONTENT_CAP = 8000
+_DEFAULT_MAX_PAGES = 4
+_DEFAULT_MIN_HTTP_CHARS = 500
+_HTTP_TIMEOUT = (5, 15)
+_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
 
+# Domains whose pages only extract in a real browser. Entries expire so a site
+# that stops needing JavaScript gets another chance on the HTTP path.
+_BROWSER_DOMAINS_STATE = "news_domains"
+_BROWSER_DOMAIN_TTL_DAYS = 7
 
-def fetch(config: dict, browser) -> list[Item]:
-    items = []
-    context = browser.new_context()
-    try:
-        for url in config["urls"]:
+# trafilatura results keyed by a hash of the HTML they came from, so identical
+# pages (paywall stubs, unchanged front pages) are only ever parsed once.
+_EXTRACT_CACHE_STATE = "news_extract"
+_EXTRACT_CACHE_TTL_HOURS = 24
+
+# Per-URL content fingerprint and HTTP validators (ETag / Last-Modified) from
+# the last fetch, so unchanged pages are skipped and changed ones get a new ID.
+_PAGES_STATE = "news_pages"
+_VALIDATOR_HEADERS = {"etag": "If-None-Match", "last-modified": "If-Modified-Since"}
+# Page state from the last fetch(), saved by commit() once its items are seen.
+_pending: dict | None = None
+
+async def fetch(config: dict, browser) -> list[Item]:
+    limit = asyncio.Semaphore(config.get("max_pages", _DEFAULT_MAX_PAGES))
+    http_first = config.get("http_first", True)
+    min_http_chars = config.get("min_http_chars", _DEFAULT_MIN_HTTP_CHARS)
+    browser_domains = _load_browser_domains()
+    known_browser_domains = dict(browser_domains)
+    extractor = _Extractor(config.get("extract_workers", _default_extract_workers()))
+    previous_pages = cache.load_state(_PAGES_STATE)
+    # Only URLs still configured are kept; failed fetches keep their old entry.
+    pages = {url: previous_pages[url] for url in config["urls"] if url in previous_pages}
+    context_task = None
+
+    async def get_context():
+        # Only pay for a browser context once some URL actually needs it.
+        nonlocal context_task
+        if context_task is None:
+            context_task = asyncio.ensure_future(browser.new_context())
+        return await context_task
+
+    def changed_item(url: str, content: str, validators: dict) -> Item | None:
+        fingerprint = hashlib.sha256(content.encode()).hexdigest()
+        unchanged = pages.get(url, {}).get("fingerprint") == fingerprint
+        pages[url] = {"fingerprint": fingerprint, **validators}
+        if unchanged:
+            logger.info("Content unchanged for %s, skipping", url)
+            return None
+        return _make_item(url, content, fingerprint)
+
+    async def fetch_url(url: str) -> Item | None:
+        async with limit:
             try:
-                items.append(_scrape(url, context))
+                domain = urlsplit(url).hostname or ""
+                previous = pages.get(url, {})
+                if http_first and domain not in browser_domains:
+                    not_modified, content, validators = await _fetch_http(
+                        url, extractor, previous
+                    )
+                    if not_modified:
+                        logger.info("Not modified since last run: %s", url)
+                        return None
+                    if content and len(content) >= min_http_chars:
+                        return changed_item(url, content, validators)
+                    logger.info("HTTP extraction too short for %s, using browser", url)
+                    browser_domains[domain] = datetime.now(timezone.utc).isoformat()
+                elif await _not_modified(url, previous):
+                    logger.info("Not modified since last run: %s", url)
+                    return None
+                content, validators = await _scrape(url, await get_context(), extractor)
+                return changed_item(url, content, validators)
             except Exception as e:
                 logger.warning("Failed to scrape %s: %s", url, e)
+                return None
+
+    try:
+        results = await asyncio.gather(*(fetch_url(url) for url in config["urls"]))
     finally:
-        context.close()
-    return items
+        if context_task is not None:
+            try:
+                await (await context_task).close()
+            except Exception as e:
+                logger.warning("Failed to close news browser context: %s", e)
+        extractor.close()
+
+    if browser_domains != known_browser_domains:
+        cache.save_state(_BROWSER_DOMAINS_STATE, browser_domains)
+    global _pending
+    _pending = {
+        "pages": pages,
+        "previous": previous_pages,
+        "item_urls": {
+            item.id: url for url, item in zip(config["urls"], results) if item is not None
+        },
+    }
+    return [item for item in results if item is not None]
+
 
+def commit(items: list[Item]) -> None:
+    """Save page fingerprints and validators from the last fetch() for seen items.
 
-def _scrape(url: str, context) -> Item:
-    page = context.new_page()
+    main calls this after summarizing and marking `items` seen. A page whose
+    item is missing because its summary failed keeps its previous entry, so
+    the next run neither skips it as unchanged nor gets a 304 for it.
+    """
+    global _pending
+    pending, _pending = _pending, None
+    if pending is None:
+        return
+    pages, previous = pending["pages"], pending["previous"]
+    seen = {item.id for item in items}
+    for item_id, url in pending["item_urls"].items():
+        if item_id in seen:
+            continue
+        if url in previous:
+            pages[url] = previous[url]
+        else:
+            pages.pop(url, None)
+    if pages != previous:
+        cache.save_state(_PAGES_STATE, pages)
+
+
+def _load_browser_domains() -> dict[str, str]:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=_BROWSER_DOMAIN_TTL_DAYS)
+    domains = {}
+    for domain, ts in cache.load_state(_BROWSER_DOMAINS_STATE).items():
+        try:
+            if datetime.fromisoformat(ts) > cutoff:
+                domains[domain] = ts
+        except (ValueError, TypeError):
+            pass  # drop malformed entries
+    return domains
+
+
+def _default_extract_workers() -> int:
+    return min(4, os.cpu_count() or 1)
+
+
+def _extract_text(html: str) -> str | None:
+    # Module-level so worker processes can unpickle it by reference.
+    return trafilatura.extract(html)
+
+
+class _Extractor:
+    """Runs trafilatura off the event loop, with a persistent result cache.
+
+    Extraction is CPU-bound, so it runs on a process pool of `workers`
+    processes (started on first use). With `workers=0` it runs on a thread.
+    """
+
+    def __init__(self, workers: int):
+        self._workers = workers
+        self._pool = None
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=_EXTRACT_CACHE_TTL_HOURS)
+        self._cache = {}
+        for key, entry in cache.load_state(_EXTRACT_CACHE_STATE).items():
+            try:
+                if datetime.fromisoformat(entry["ts"]) > cutoff:
+                    self._cache[key] = entry
+            except (KeyError, ValueError, TypeError):
+                pass  # drop malformed entries
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._dirty = False
+
+    async def extract(self, html: str) -> str | None:
+        key = hashlib.sha256(html.encode()).hexdigest()
+        if key in self._cache:
+            return self._cache[key]["text"]
+        # Pages fetched concurrently may be identical; parse them once.
+        if key not in self._in_flight:
+            self._in_flight[key] = asyncio.ensure_future(self._extract(key, html))
+        try:
+            return await asyncio.shield(self._in_flight[key])
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def _extract(self, key: str, html: str) -> str | None:
+        if self._workers > 0 and self._pool is None:
+            self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self._workers)
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(self._pool, _extract_text, html)
+        if text:
+            text = text[:CONTENT_CAP]
+        self._cache[key] = {"text": text, "ts": datetime.now(timezone.utc).isoformat()}
+        self._dirty = True
+        return text
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._dirty:
+            cache.save_state(_EXTRACT_CACHE_STATE, self._cache)
+            self._dirty = False
+
+
+async def _fetch_http(
+    url: str, extractor: _Extractor, previous: dict
+) -> tuple[bool, str | None, dict]:
+    """Conditionally fetch `url` without a browser.
+
+    Returns (not_modified, extracted_text, validators). A failed fetch is
+    reported as modified with no text, so the caller falls back to the browser.
+    """
     try:
-        page.goto(url, wait_until="domcontentloaded", timeout=30000)
-        html = page.content()
-        extracted = trafilatura.extract(html)
+        status, html, validators = await asyncio.to_thread(
+            _fetch_http_sync, url, _conditional_headers(previous)
+        )
+        if status == 304:
+            return True, None, {}
+        return False, await extractor.extract(html), validators
+    except Exception as e:
+        logger.info("HTTP fetch failed for %s, using browser: %s", url, e)
+        return False, None, {}
+
+
+def _fetch_http_sync(url: str, headers: dict) -> tuple[int, str, dict]:
+    resp = http_client.get(
+        url, headers={"User-Agent": _USER_AGENT, **headers}, timeout=_HTTP_TIMEOUT
+    )
+    resp.raise_for_status()
+    return resp.status_code, resp.text, _validators(resp.headers)
+
+
+async def _not_modified(url: str, previous: dict) -> bool:
+    """Ask the server whether a browser-only page changed, without rendering it."""
+    headers = _conditional_headers(previous)
+    if not headers:
+        return False
+
+    def check() -> bool:
+        with http_client.get(
+            url, headers={"User-Agent": _USER_AGENT, **headers}, timeout=_HTTP_TIMEOUT, stream=True
+        ) as resp:
+            return resp.status_code == 304
+
+    try:
+        return await asyncio.to_thread(check)
+    except Exception as e:
+        logger.info("Conditional request failed for %s: %s", url, e)
+        return False
+
+
+def _conditional_headers(previous: dict) -> dict:
+    return {
+        request_header: previous[name]
+        for name, request_header in _VALIDATOR_HEADERS.items()
+        if previous.get(name)
+    }
+
+
+def _validators(headers) -> dict:
+    return {name: headers[name] for name in _VALIDATOR_HEADERS if headers.get(name)}
+
+
+async def _scrape(url: str, context, extractor: _Extractor) -> tuple[str, dict]:
+    page = await context.new_page()
+    try:
+        response = await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        html = await page.content()
+        extracted = await extractor.extract(html)
         if extracted:
-            content = extracted[:CONTENT_CAP]
+            content = extracted
         else:
-            content = page.inner_text("body")[:CONTENT_CAP]
+            content = await page.inner_text("body")
     finally:
-        page.close()
+        await page.close()
+    validators = _validators(response.headers) if response is not None else {}
+    return content[:CONTENT_CAP], validators
+
+
+def _make_item(url: str, content: str, fingerprint: str) -> Item:
     return Item(
-        id=hashlib.md5(url.encode()).hexdigest(),
+        id=hashlib.md5(f"{url}\n{fingerprint}".encode()).hexdigest(),
         source="news",
-        content=content,
+        content=content[:CONTENT_CAP],
         timestamp=datetime.now(timezone.utc).isoformat(),
     )
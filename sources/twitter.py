@@ -1,32 +1,118 @@
+import asyncio
 import logging
 import re
 from datetime import datetime, timezone
+from pathlib import Path
 
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+import cache
 from sources.base import Item
 
 logger = logging.getLogger(__name__)
 
 _SESSION_URL = "https://x.com/home"
 _STATUS_PATH_RE = re.compile(r"^/([^/]+)/status/(\d+)")
+# GraphQL operations whose responses carry timeline tweets.
+_TIMELINE_API_RE = re.compile(
+    r"/i/api/graphql/[^/]+/"
+    r"(HomeTimeline|HomeLatestTimeline|ListLatestTweetsTimeline|UserTweets|SearchTimeline)\b"
+)
+_TWITTER_TIME_FORMAT = "%a %b %d %H:%M:%S %z %Y"
+
+_SCROLL_JS = "window.scrollBy(0, Math.max(window.innerHeight * 1.8, 1400));"
+# Installs window.__phobosTweets: a MutationObserver queues each tweet article
+# once as it is inserted (or gets its text), so a scroll costs work in
+# proportion to the new tweets rather than to everything already on the page.
+_COLLECTOR_JS = """() => {
+    if (window.__phobosTweets) return;
+    const ARTICLE = "article[data-testid='tweet']";
+    const seen = new Set();
+    const queue = [];
+    const collect = (article) => {
+        const link = article.querySelector("a[href*='/status/']");
+        if (!link) return;
+        const href = link.getAttribute("href") || "";
+        if (seen.has(href)) return;
+        const textEl = article.querySelector("[data-testid='tweetText']");
+        const text = textEl ? textEl.innerText.trim() : "";
+        if (!text) return;  // not rendered yet; a later mutation retries
+        seen.add(href);
+        const timeEl = article.querySelector("time");
+        const timestamp = timeEl ? timeEl.getAttribute("datetime") : null;
+        const social = article.querySelector("[data-testid='socialContext']");
+        const context = social ? social.innerText : "";
+        const pinned = /pinned/i.test(context);
+        const retweet = /reposted|retweeted/i.test(context);
+        const promoted = /promoted/i.test(context)
+            || !!article.querySelector("[data-testid='placementTracking']");
+        queue.push({ href, text, timestamp, pinned, retweet, promoted });
+    };
+    const scan = (node) => {
+        const article = node.closest(ARTICLE);
+        if (article) {
+            collect(article);
+            return;
+        }
+        node.querySelectorAll(ARTICLE).forEach(collect);
+    };
+    scan(document.body);
+    new MutationObserver((mutations) => {
+        for (const mutation of mutations) {
+            for (const node of mutation.addedNodes) {
+                if (node.nodeType === Node.ELEMENT_NODE) scan(node);
+            }
+        }
+    }).observe(document.body, { childList: true, subtree: true });
+    window.__phobosTweets = {
+        pending: () => queue.length,
+        drain: () => queue.splice(0),
+    };
+}"""
+# Rows the DOM scraper waits for after each scroll before draining the queue.
+_SCROLL_BATCH = 5
 
 _DEFAULT_COUNT = 20
 _DEFAULT_MAX_SCROLLS = 8
 _DEFAULT_SCROLL_PAUSE_MS = 1200
 _SESSION_PRIME_WAIT_MS = 1200
+# Network mode waits this long for the timeline response after each scroll.
+_DEFAULT_RESPONSE_TIMEOUT_MS = 5000
+# Feeds (home, lists, profiles, searches) scraped at the same time.
+_DEFAULT_MAX_FEEDS = 3
+# Newest tweet ID delivered per feed by the previous run; scrolling that feed
+# stops once this many tweets in a row are at or below it. One is not enough:
+# algorithmic feeds ("For you") do not list tweets in ID order.
+_STATE_NAME = "twitter_state"
+_DEFAULT_STOP_AFTER_OLD = 3
+# High-water state from the last fetch(), saved by commit() once its items are seen.
+_pending: dict | None = None
+# Browser storage state (cookies, local storage) of the last good session, so
+# the next run can skip _prime_session.
+_SESSION_FILE_NAME = "twitter_session.json"
+_LOGIN_URL_MARKERS = ("/login", "/i/flow/", "/logout")
 
 
-def fetch(config: dict, browser) -> list[Item]:
-    context = browser.new_context(
-        viewport={"width": 1280, "height": 2200},
-        user_agent=(
-            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
-            "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        ),
-    )
+async def fetch(config: dict, browser) -> list[Item]:
+    global _pending
+    _pending = None
+    session_file = cache.CACHE_DIR / _SESSION_FILE_NAME
+    use_stored_session = session_file.exists()
+    context = None
+    if use_stored_session:
+        try:
+            context = await _new_context(browser, session_file)
+        except Exception as e:
+            logger.info("Stored twitter session is unreadable, priming a new one: %s", e)
+            session_file.unlink(missing_ok=True)
+            use_stored_session = False
+    if context is None:
+        context = await _new_context(browser, None)
     items: list[Item] = []
     try:
-        _apply_auth_cookies(context, config)
-        _prime_session(context)
+        await _apply_auth_cookies(context, config)
+        if not use_stored_session:
+            await _prime_session(context)
         allowed_authors = None
         if config.get("filter_usernames", False):
             allowed_authors = {
@@ -35,22 +121,175 @@ def fetch(config: dict, browser) -> list[Item]:
                 if username and username.strip()
             } or None
 
-        items = _scrape_home_feed(
+        state = cache.load_state(_STATE_NAME)
+        high_water = _load_high_water(state)
+        try:
+            items, newest = await _scrape(context, config, allowed_authors, high_water)
+        except _SessionRejected:
+            if not use_stored_session:
+                raise
+            logger.info("Stored twitter session was rejected, priming a new one")
+            session_file.unlink(missing_ok=True)
+            await context.close()
+            context = await _new_context(browser, None)
+            await _apply_auth_cookies(context, config)
+            await _prime_session(context)
+            items, newest = await _scrape(context, config, allowed_authors, high_water)
+
+        await _save_session(context, session_file)
+        if newest:
+            high_water.update(newest)
+            _pending = {
+                "state": {
+                    **state,
+                    "high_water": {url: str(i) for url, i in high_water.items()},
+                },
+                "item_ids": {item.id for item in items},
+            }
+    except Exception as e:
+        logger.warning("Failed to fetch tweets: %s", e)
+    finally:
+        await context.close()
+
+    return items
+
+
+def commit(items: list[Item]) -> None:
+    """Save the high-water marks reached by the last fetch() once its items are seen.
+
+    main calls this after summarizing and marking `items` seen. If any fetched
+    tweet is missing because its summary failed, the marks are not advanced,
+    so the next run scrolls back to it.
+    """
+    global _pending
+    pending, _pending = _pending, None
+    if pending is not None and pending["item_ids"] <= {item.id for item in items}:
+        cache.save_state(_STATE_NAME, pending["state"])
+
+
+class _SessionRejected(Exception):
+    """X redirected the timeline to a login page."""
+
+
+async def _new_context(browser, session_file: Path | None):
+    return await browser.new_context(
+        viewport={"width": 1280, "height": 2200},
+        user_agent=(
+            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        ),
+        storage_state=str(session_file) if session_file is not None else None,
+    )
+
+
+async def _save_session(context, session_file: Path) -> None:
+    # The stored state holds auth cookies; keep it private to this user. Written
+    # to a temp file and renamed, so an interrupted run never leaves it truncated.
+    session_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = session_file.with_suffix(".json.tmp")
+    await context.storage_state(path=str(tmp_file))
+    tmp_file.chmod(0o600)
+    tmp_file.replace(session_file)
+
+
+def _check_session(page) -> None:
+    if any(marker in page.url for marker in _LOGIN_URL_MARKERS):
+        raise _SessionRejected(page.url)
+
+
+def _load_high_water(state: dict) -> dict[str, int]:
+    high_water = state.get("high_water")
+    if not isinstance(high_water, dict):
+        # Single-feed state from before feeds were configurable.
+        high_water = {_SESSION_URL: high_water}
+    return {
+        url: tweet_id
+        for url, tweet_id in (
+            (url, _parse_tweet_id(value)) for url, value in high_water.items()
+        )
+        if tweet_id is not None
+    }
+
+
+async def _scrape(
+    context,
+    config: dict,
+    allowed_authors: set[str] | None,
+    high_water: dict[str, int],
+) -> tuple[list[Item], dict[str, int]]:
+    """Scrape every configured feed on its own page, at most max_feeds at once.
+
+    Returns the merged items, de-duplicated by tweet ID in feed order, and the
+    newest tweet ID seen per feed. A rejected session fails the whole scrape so
+    the caller can re-prime; any other per-feed failure only skips that feed.
+    """
+    feeds = config.get("feeds") or [_SESSION_URL]
+    limit = asyncio.Semaphore(config.get("max_feeds", _DEFAULT_MAX_FEEDS))
+
+    async def scrape_feed(url: str) -> list[Item]:
+        async with limit:
+            return await _scrape_feed(
+                context, config, url, allowed_authors, high_water.get(url)
+            )
+
+    results = await asyncio.gather(
+        *(scrape_feed(url) for url in feeds), return_exceptions=True
+    )
+
+    items: list[Item] = []
+    seen_ids: set[str] = set()
+    newest: dict[str, int] = {}
+    for url, result in zip(feeds, results):
+        if isinstance(result, _SessionRejected):
+            raise result
+        if isinstance(result, Exception):
+            logger.warning("Failed to fetch tweets from %s: %s", url, result)
+            continue
+        # A retweet's ID is the original tweet's, so it says nothing about
+        # how far this feed was read.
+        own_ids = [int(item.id) for item in result if not _is_retweet(item)]
+        if own_ids:
+            newest[url] = max(own_ids)
+        for item in result:
+            if item.id not in seen_ids:
+                seen_ids.add(item.id)
+                items.append(item)
+    return items, newest
+
+
+async def _scrape_feed(
+    context,
+    config: dict,
+    url: str,
+    allowed_authors: set[str] | None,
+    since_id: int | None,
+) -> list[Item]:
+    if config.get("mode", "dom") == "network":
+        return await _scrape_home_feed_from_network(
             context=context,
+            url=url,
             count=config.get("count", _DEFAULT_COUNT),
             max_scrolls=config.get("max_scrolls", _DEFAULT_MAX_SCROLLS),
-            scroll_pause_ms=config.get("scroll_pause_ms", _DEFAULT_SCROLL_PAUSE_MS),
+            response_timeout_ms=config.get(
+                "response_timeout_ms", _DEFAULT_RESPONSE_TIMEOUT_MS
+            ),
             allowed_authors=allowed_authors,
+            since_id=since_id,
+            stop_after_old=config.get("stop_after_old", _DEFAULT_STOP_AFTER_OLD),
         )
-    except Exception as e:
-        logger.warning("Failed to fetch tweets from home feed: %s", e)
-    finally:
-        context.close()
-
-    return items
+    return await _scrape_home_feed(
+        context=context,
+        url=url,
+        count=config.get("count", _DEFAULT_COUNT),
+        max_scrolls=config.get("max_scrolls", _DEFAULT_MAX_SCROLLS),
+        scroll_pause_ms=config.get("scroll_pause_ms", _DEFAULT_SCROLL_PAUSE_MS),
+        allowed_authors=allowed_authors,
+        since_id=since_id,
+        stop_after_old=config.get("stop_after_old", _DEFAULT_STOP_AFTER_OLD),
+    )
 
 
-def _apply_auth_cookies(context, config: dict) -> None:
+async def _apply_auth_cookies(context, config: dict) -> None:
     auth_token = config["auth_token"]
     ct0 = config["ct0"]
     cookies = []
@@ -74,50 +313,69 @@ def _apply_auth_cookies(context, config: dict) -> None:
                 },
             ]
         )
-    context.add_cookies(cookies)
+    await context.add_cookies(cookies)
 
 
-def _prime_session(context) -> None:
-    page = context.new_page()
+async def _prime_session(context) -> None:
+    page = await context.new_page()
     try:
-        page.goto(_SESSION_URL, wait_until="domcontentloaded", timeout=45000)
-        page.wait_for_timeout(_SESSION_PRIME_WAIT_MS)
+        await page.goto(_SESSION_URL, wait_until="domcontentloaded", timeout=45000)
+        await page.wait_for_timeout(_SESSION_PRIME_WAIT_MS)
         # Refresh once to let X rotate/refresh transient session state.
-        page.reload(wait_until="domcontentloaded", timeout=45000)
-        page.wait_for_timeout(_SESSION_PRIME_WAIT_MS)
+        await page.reload(wait_until="domcontentloaded", timeout=45000)
+        await page.wait_for_timeout(_SESSION_PRIME_WAIT_MS)
     finally:
-        page.close()
+        await page.close()
 
 
-def _scrape_home_feed(
+async def _scrape_home_feed(
     context,
     count: int,
     max_scrolls: int,
     scroll_pause_ms: int,
     allowed_authors: set[str] | None = None,
+    since_id: int | None = None,
+    url: str = _SESSION_URL,
+    stop_after_old: int = _DEFAULT_STOP_AFTER_OLD,
 ) -> list[Item]:
-    page = context.new_page()
+    """Scroll the rendered timeline, collecting tweets as they are inserted.
+
+    An in-page collector queues each new tweet article once. After each scroll
+    we wait until `_SCROLL_BATCH` tweets are queued or `scroll_pause_ms`
+    passes, then pull only the queued rows. Tweets at or below `since_id` are
+    skipped; `stop_after_old` of them in a row end the scrape.
+    """
+    page = await context.new_page()
     items: list[Item] = []
     seen_ids: set[str] = set()
     no_growth_rounds = 0
+    old_in_a_row = 0
 
     try:
-        page.goto(_SESSION_URL, wait_until="domcontentloaded", timeout=45000)
-        page.wait_for_timeout(scroll_pause_ms)
+        await page.goto(url, wait_until="domcontentloaded", timeout=45000)
+        _check_session(page)
+        await page.evaluate(_COLLECTOR_JS)
+        await _wait_for_new_tweets(page, min(count, _SCROLL_BATCH), scroll_pause_ms)
 
         for _ in range(max_scrolls):
             fresh_in_round = 0
-            for item in _extract_tweets_from_page(
-                page, allowed_authors=allowed_authors
-            ):
+            rows = await page.evaluate("window.__phobosTweets.drain()")
+            for item in _tweets_from_rows(rows, allowed_authors=allowed_authors):
                 if item.id in seen_ids:
                     continue
                 seen_ids.add(item.id)
+                if _reaches_mark(item, since_id):
+                    old_in_a_row += 1
+                    continue
+                if not _is_retweet(item):
+                    old_in_a_row = 0
                 items.append(item)
                 fresh_in_round += 1
                 if len(items) >= count:
                     return items[:count]
 
+            if old_in_a_row >= stop_after_old:
+                break  # everything further down was delivered by an earlier run
             if fresh_in_round == 0:
                 no_growth_rounds += 1
                 if no_growth_rounds >= 2:
@@ -125,33 +383,49 @@ def _scrape_home_feed(
             else:
                 no_growth_rounds = 0
 
-            _scroll_timeline(page, scroll_pause_ms)
+            await page.evaluate(_SCROLL_JS)
+            await _wait_for_new_tweets(
+                page, min(count - len(items), _SCROLL_BATCH), scroll_pause_ms
+            )
     finally:
-        page.close()
+        await page.close()
 
     return items[:count]
 
 
-def _extract_tweets_from_page(
-    page, allowed_authors: set[str] | None = None
-) -> list[Item]:
-    rows = page.eval_on_selector_all(
-        "article[data-testid='tweet']",
-        """(articles) => articles.map((article) => {
-            const link = article.querySelector("a[href*='/status/']");
-            if (!link) return null;
-            const href = link.getAttribute("href") || "";
-            const textEl = article.querySelector("[data-testid='tweetText']");
-            const text = textEl ? textEl.innerText.trim() : "";
-            if (!text) return null;
-            const timeEl = article.querySelector("time");
-            const timestamp = timeEl ? timeEl.getAttribute("datetime") : null;
-            return { href, text, timestamp };
-        }).filter(Boolean)""",
-    )
+def _reaches_mark(item: Item, since_id: int | None) -> bool:
+    """Whether `item` is at or below the last run's newest tweet.
+
+    Retweets carry the original tweet's (possibly much older) ID wherever they
+    appear in the timeline, so they never count, nor break a run of old tweets.
+    """
+    if since_id is None or _is_retweet(item):
+        return False
+    return int(item.id) <= since_id
 
+
+def _is_retweet(item: Item) -> bool:
+    return bool((item.data or {}).get("retweet"))
+
+
+async def _wait_for_new_tweets(page, wanted: int, timeout_ms: int) -> None:
+    try:
+        await page.wait_for_function(
+            "(wanted) => window.__phobosTweets.pending() >= wanted",
+            arg=wanted,
+            timeout=timeout_ms,
+        )
+    except PlaywrightTimeoutError:
+        pass  # take whatever arrived
+
+
+def _tweets_from_rows(rows: list[dict], allowed_authors: set[str] | None = None) -> list[Item]:
     items: list[Item] = []
     for row in rows:
+        if (row or {}).get("pinned"):
+            continue  # profile pins are usually old and would trip the high-water mark
+        if (row or {}).get("promoted"):
+            continue  # ads are not timeline content and are placed out of order
         author, tweet_id = _extract_tweet_parts((row or {}).get("href", ""))
         if not author or not tweet_id:
             continue
@@ -172,14 +446,173 @@ def _extract_tweets_from_page(
                 source="twitter",
                 content=text,
                 timestamp=timestamp,
+                data={"retweet": True} if (row or {}).get("retweet") else None,
             )
         )
     return items
 
 
-def _scroll_timeline(page, pause_ms: int) -> None:
-    page.evaluate("window.scrollBy(0, Math.max(window.innerHeight * 1.8, 1400));")
-    page.wait_for_timeout(pause_ms)
+async def _scrape_home_feed_from_network(
+    context,
+    count: int,
+    max_scrolls: int,
+    response_timeout_ms: int,
+    allowed_authors: set[str] | None = None,
+    since_id: int | None = None,
+    url: str = _SESSION_URL,
+    stop_after_old: int = _DEFAULT_STOP_AFTER_OLD,
+) -> list[Item]:
+    """Collect tweets from the timeline's GraphQL responses instead of the DOM.
+
+    Each scroll makes X request the next timeline page; we wait for that
+    response rather than a fixed pause, and never serialize rendered articles.
+    The high-water mark works as in _scrape_home_feed.
+    """
+    page = await context.new_page()
+    payloads: asyncio.Queue = asyncio.Queue()
+    items: list[Item] = []
+    seen_ids: set[str] = set()
+    old_in_a_row = 0
+
+    async def on_response(response) -> None:
+        if not _TIMELINE_API_RE.search(response.url):
+            return
+        try:
+            payloads.put_nowait(await response.json())
+        except Exception as e:
+            logger.debug("Unreadable timeline response %s: %s", response.url, e)
+
+    page.on("response", on_response)
+    try:
+        await page.goto(url, wait_until="domcontentloaded", timeout=45000)
+        _check_session(page)
+
+        for round_ in range(max_scrolls + 1):
+            if round_ > 0:
+                await page.evaluate(_SCROLL_JS)
+            try:
+                payload = await asyncio.wait_for(
+                    payloads.get(), timeout=response_timeout_ms / 1000
+                )
+            except asyncio.TimeoutError:
+                break  # no further timeline pages arrived
+
+            batch = [payload]
+            while not payloads.empty():
+                batch.append(payloads.get_nowait())
+            for payload in batch:
+                for item in _tweets_from_timeline_payload(payload, allowed_authors):
+                    if item.id in seen_ids:
+                        continue
+                    seen_ids.add(item.id)
+                    if _reaches_mark(item, since_id):
+                        old_in_a_row += 1
+                        continue
+                    if not _is_retweet(item):
+                        old_in_a_row = 0
+                    items.append(item)
+                    if len(items) >= count:
+                        return items[:count]
+            if old_in_a_row >= stop_after_old:
+                break  # everything further down was delivered by an earlier run
+    finally:
+        await page.close()
+
+    return items[:count]
+
+
+def _tweets_from_timeline_payload(
+    payload, allowed_authors: set[str] | None = None
+) -> list[Item]:
+    items: list[Item] = []
+    for result in _iter_tweet_results(payload):
+        tweet = _unwrap_tweet_result(result)
+        if tweet is None:
+            continue
+        retweeted = tweet.get("legacy", {}).get("retweeted_status_result", {}).get("result")
+        original = _unwrap_tweet_result(retweeted) if retweeted is not None else None
+        if original is not None:
+            # Match DOM mode, which links retweets to the original tweet.
+            tweet = original
+
+        legacy = tweet.get("legacy", {})
+        tweet_id = tweet.get("rest_id") or legacy.get("id_str")
+        author = _tweet_author(tweet)
+        text = (
+            tweet.get("note_tweet", {})
+            .get("note_tweet_results", {})
+            .get("result", {})
+            .get("text")
+            or legacy.get("full_text")
+            or ""
+        ).strip()
+        if not tweet_id or not author or not text:
+            continue
+        if allowed_authors and author.lower() not in allowed_authors:
+            continue
+
+        items.append(
+            Item(
+                id=tweet_id,
+                source="twitter",
+                content=text,
+                timestamp=_parse_tweet_time(legacy.get("created_at")),
+                data={"retweet": True} if original is not None else None,
+            )
+        )
+    return items
+
+
+def _iter_tweet_results(node):
+    """Yield every `tweet_results.result` in timeline order, at any depth.
+
+    Home, list, profile and search timelines nest entries differently, so
+    this walks the payload instead of hard-coding one instruction layout.
+    """
+    if isinstance(node, dict):
+        if node.get("type") == "TimelinePinEntry":
+            return  # profile pins are usually old and would trip the high-water mark
+        if node.get("promotedMetadata") or str(node.get("entryId", "")).startswith("promoted"):
+            return  # ads are not timeline content and are placed out of order
+        tweet_results = node.get("tweet_results")
+        if isinstance(tweet_results, dict) and "result" in tweet_results:
+            yield tweet_results["result"]
+            return
+        for value in node.values():
+            yield from _iter_tweet_results(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _iter_tweet_results(value)
+
+
+def _unwrap_tweet_result(result: dict) -> dict | None:
+    if result.get("__typename") == "TweetWithVisibilityResults":
+        result = result.get("tweet", {})
+    if "rest_id" not in result and "legacy" not in result:
+        return None  # TweetTombstone, TweetUnavailable, ...
+    return result
+
+
+def _tweet_author(tweet: dict) -> str | None:
+    user = tweet.get("core", {}).get("user_results", {}).get("result", {})
+    return (
+        user.get("core", {}).get("screen_name")
+        or user.get("legacy", {}).get("screen_name")
+    )
+
+
+def _parse_tweet_time(created_at: str | None) -> str:
+    try:
+        return datetime.strptime(created_at, _TWITTER_TIME_FORMAT).isoformat()
+    except (TypeError, ValueError):
+        return datetime.now(timezone.utc).isoformat()
+
+
+def _parse_tweet_id(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 
 def _extract_tweet_parts(href: str) -> tuple[str | None, str | None]:
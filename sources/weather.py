@@ -1,16 +1,52 @@
-import requests
+import concurrent.futures
+import copy
+import logging
+from email.utils import parsedate_to_datetime
+
 from datetime import datetime, timezone
+
+import cache
+import http_client
 from sources.base import Item
 
+logger = logging.getLogger(__name__)
+
 AMBIENT_URL = "https://api.ambientweather.net/v1/devices"
 NWS_POINTS_URL = "https://api.weather.gov/points/{lat},{lon}"
+_HTTP_TIMEOUT = (5, 15)
+_NWS_HEADERS = {"User-Agent": "phobos-pipeline"}
+
+# Station coordinates from the last run, the NWS points -> forecast URL mapping
+# (fixed for a given location) and forecasts kept until their Expires header.
+# Not "weather": cache/weather.json is main's seen-item cache for this source.
+_STATE_NAME = "weather_state"
 
 
 def fetch(config: dict, browser) -> list[Item]:
-    device = _fetch_ambient_device(config)
+    state = cache.load_state(_STATE_NAME)
+    known_state = copy.deepcopy(state)
+
+    # With coordinates known up front, NWS runs alongside the Ambient request.
+    guessed = _known_coords(state, config)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+        device_future = pool.submit(_fetch_ambient_device, config)
+        forecast_future = None
+        if guessed is not None:
+            forecast_future = pool.submit(_fetch_nws_forecast, *guessed, state)
+        device = device_future.result()
+        lat, lon = _get_coords(device, config)
+        if forecast_future is not None and guessed == (lat, lon):
+            forecast = forecast_future.result()
+        else:
+            if forecast_future is not None:
+                concurrent.futures.wait([forecast_future])
+            forecast = _fetch_nws_forecast(lat, lon, state)
+
+    state["coords"] = [lat, lon]
+    if state != known_state:
+        cache.save_state(_STATE_NAME, state)
+
     current = device["lastData"]
-    lat, lon = _get_coords(device, config)
-    forecast = _fetch_nws_forecast(lat, lon)
     content = f"Current conditions: {current}\n\nForecast: {forecast}"
     item_id = f"weather-{current['dateutc']}"
     return [Item(
@@ -18,18 +54,29 @@ def fetch(config: dict, browser) -> list[Item]:
         source="weather",
         content=content,
         timestamp=datetime.now(timezone.utc).isoformat(),
+        data={**current, "forecast": forecast},
     )]
 
 
 def _fetch_ambient_device(config: dict) -> dict:
-    resp = requests.get(AMBIENT_URL, params={
+    resp = http_client.get(AMBIENT_URL, params={
         "apiKey": config["ambient_api_key"],
         "applicationKey": config["ambient_app_key"],
-    })
+    }, timeout=_HTTP_TIMEOUT)
     resp.raise_for_status()
     return resp.json()[0]
 
 
+def _known_coords(state: dict, config: dict) -> tuple[float, float] | None:
+    # Station coordinates take precedence over the config, as in _get_coords.
+    if state.get("coords"):
+        lat, lon = state["coords"]
+        return lat, lon
+    if "nws_lat" in config and "nws_lon" in config:
+        return float(config["nws_lat"]), float(config["nws_lon"])
+    return None
+
+
 def _get_coords(device: dict, config: dict) -> tuple[float, float]:
     coords = device.get("info", {}).get("coords", {}).get("coords", {})
     if coords.get("lat") and coords.get("lon"):
@@ -42,15 +89,50 @@ def _get_coords(device: dict, config: dict) -> tuple[float, float]:
     )
 
 
-def _fetch_nws_forecast(lat: float, lon: float) -> str:
-    headers = {"User-Agent": "phobos-pipeline"}
-    points_url = NWS_POINTS_URL.format(lat=lat, lon=lon)
-    points_resp = requests.get(points_url, headers=headers)
-    points_resp.raise_for_status()
-    forecast_url = points_resp.json()["properties"]["forecast"]
-    forecast_resp = requests.get(forecast_url, headers=headers)
+def _fetch_nws_forecast(lat: float, lon: float, state: dict) -> str:
+    points = state.setdefault("points", {})
+    forecasts = state.setdefault("forecasts", {})
+    point_key = f"{lat},{lon}"
+    forecast_url = points.get(point_key)
+    from_cache = forecast_url is not None
+    if not from_cache:
+        points_resp = http_client.get(
+            NWS_POINTS_URL.format(lat=lat, lon=lon), headers=_NWS_HEADERS, timeout=_HTTP_TIMEOUT
+        )
+        points_resp.raise_for_status()
+        forecast_url = points_resp.json()["properties"]["forecast"]
+        points[point_key] = forecast_url
+
+    cached = forecasts.get(forecast_url)
+    if cached and datetime.fromisoformat(cached["expires"]) > datetime.now(timezone.utc):
+        return cached["text"]
+
+    forecast_resp = http_client.get(forecast_url, headers=_NWS_HEADERS, timeout=_HTTP_TIMEOUT)
+    if forecast_resp.status_code == 404 and from_cache:
+        logger.info("NWS forecast URL for %s is gone, looking the point up again", point_key)
+        del points[point_key]
+        return _fetch_nws_forecast(lat, lon, state)
     forecast_resp.raise_for_status()
     periods = forecast_resp.json()["properties"]["periods"]
     if not periods:
         return "No forecast available."
-    return periods[0]["detailedForecast"]
+    text = periods[0]["detailedForecast"]
+
+    expires = _parse_expires(forecast_resp.headers.get("expires"))
+    # Only the current location's forecast is worth keeping.
+    forecasts.clear()
+    if expires is not None:
+        forecasts[forecast_url] = {"expires": expires.isoformat(), "text": text}
+    return text
+
+
+def _parse_expires(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        expires = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+    return expires
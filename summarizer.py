@@ -1,4 +1,4 @@
-import requests
+import llm
 
 SUMMARIZE_PROMPT = (
     "You are a digest summarizer. Concisely summarize the following content, "
@@ -8,11 +8,4 @@ SUMMARIZE_PROMPT = (
 
 def summarize(text: str, config: dict) -> str:
     """Run text through a second Ollama pass to compress it."""
-    full_prompt = f"{SUMMARIZE_PROMPT}\n\n{text}"
-    response = requests.post(
-        f"{config['base_url']}/api/generate",
-        json={"model": config["model"], "prompt": full_prompt, "stream": False},
-        timeout=config.get("timeout", 120),
-    )
-    response.raise_for_status()
-    return response.json()["response"]
+    return llm.generate(f"{SUMMARIZE_PROMPT}\n\n{text}", config)
@@ -1,7 +1,7 @@
 import logging
 import re
 
-import requests
+import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +32,7 @@ def send(text: str, config: dict) -> None:
     logger.info("Sending to chat_id %s", chat_id)
     url = TELEGRAM_API.format(token=token)
     for chunk in _split(_strip_markdown(text)):
-        response = requests.post(
+        response = http_client.post(
             url,
             json={
                 "chat_id": chat_id,
@@ -47,7 +47,7 @@ def send(text: str, config: dict) -> None:
 
 
 def _get_chat_id(token: str) -> int:
-    response = requests.get(TELEGRAM_UPDATES_API.format(token=token))
+    response = http_client.get(TELEGRAM_UPDATES_API.format(token=token))
     response.raise_for_status()
     updates = response.json().get("result", [])
     if not updates:
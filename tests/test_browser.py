@@ -0,0 +1,161 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import browser
+from sources.base import Item
+
+
+def make_item(source: str) -> Item:
+    return Item(id="1", source=source, content="stuff", timestamp="2026-01-01T00:00:00")
+
+
+def test_limited_browser_caps_open_pages():
+    limited = browser.LimitedBrowser(AsyncMock(), max_contexts=2, max_pages=2)
+    open_pages = 0
+    peak = 0
+
+    async def use_page(context):
+        nonlocal open_pages, peak
+        page = await context.new_page()
+        open_pages += 1
+        peak = max(peak, open_pages)
+        await asyncio.sleep(0.01)
+        open_pages -= 1
+        await page.close()
+
+    async def scenario():
+        context = await limited.new_context()
+        await asyncio.gather(*(use_page(context) for _ in range(6)))
+        await context.close()
+
+    asyncio.run(scenario())
+    assert peak == 2
+
+
+def test_limited_context_close_frees_unclosed_pages():
+    limited = browser.LimitedBrowser(AsyncMock(), max_contexts=1, max_pages=1)
+
+    async def scenario():
+        context = await limited.new_context()
+        await context.new_page()  # never closed explicitly
+        await context.close()
+        context = await asyncio.wait_for(limited.new_context(), timeout=1)
+        await asyncio.wait_for(context.new_page(), timeout=1)
+
+    asyncio.run(scenario())
+
+
+def test_fetch_all_runs_sources_concurrently_and_isolates_failures(mocker):
+    mocker.patch("browser.async_playwright")
+    results = {}
+
+    async def run():
+        started = asyncio.Event()
+
+        async def news_fetch(cfg, b):
+            # Only completes if twitter is already running alongside it.
+            await asyncio.wait_for(started.wait(), timeout=1)
+            return [make_item("news")]
+
+        async def twitter_fetch(cfg, b):
+            started.set()
+            raise RuntimeError("login wall")
+
+        await browser.fetch_all(
+            {"news": (news_fetch, {}), "twitter": (twitter_fetch, {})},
+            {},
+            lambda name, items: results.__setitem__(name, items),
+        )
+
+    asyncio.run(run())
+    assert list(results) == ["news"]
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type, method="GET"):
+        self.url = url
+        self.resource_type = resource_type
+        self.method = method
+
+
+def _route(url, resource_type, body=b"console.log(1)"):
+    route = AsyncMock()
+    route.request = FakeRequest(url, resource_type)
+    response = AsyncMock()
+    response.status = 200
+    response.headers = {"content-type": "text/javascript", "content-encoding": "gzip"}
+    response.body.return_value = body
+    route.fetch.return_value = response
+    return route
+
+
+def test_lean_route_blocks_unneeded_resource_types():
+    handle = browser._lean_route_handler({"lean": True})
+    image = _route("https://example.com/a.png", "image")
+    document = _route("https://example.com/", "document")
+
+    asyncio.run(handle(image))
+    asyncio.run(handle(document))
+
+    image.abort.assert_called_once()
+    document.continue_.assert_called_once()
+    document.abort.assert_not_called()
+
+
+def test_lean_route_serves_scripts_from_disk_cache_on_next_run():
+    first = _route("https://example.com/app.js", "script")
+    asyncio.run(browser._lean_route_handler({"lean": True})(first))
+    first.fetch.assert_called_once()
+
+    # A fresh handler (next run) reads the asset back from disk.
+    second = _route("https://example.com/app.js", "script")
+    asyncio.run(browser._lean_route_handler({"lean": True})(second))
+
+    second.fetch.assert_not_called()
+    kwargs = second.fulfill.call_args.kwargs
+    assert kwargs["body"] == b"console.log(1)"
+    assert "content-encoding" not in kwargs["headers"]
+
+
+def _cache_twice(url, headers):
+    first = _route(url, "script")
+    first.fetch.return_value.headers = headers
+    asyncio.run(browser._lean_route_handler({"lean": True})(first))
+    second = _route(url, "script")
+    asyncio.run(browser._lean_route_handler({"lean": True})(second))
+    return second
+
+
+def test_lean_route_never_replays_cookies_from_disk_cache():
+    second = _cache_twice(
+        "https://example.com/app.js",
+        {"content-type": "text/javascript", "Set-Cookie": "session=abc"},
+    )
+
+    second.fetch.assert_not_called()
+    headers = second.fulfill.call_args.kwargs["headers"]
+    assert {k.lower() for k in headers} == {"content-type"}
+
+
+def test_lean_route_caps_disk_cache_entry_at_max_age(mocker):
+    url = "https://example.com/app.js"
+    _cache_twice(url, {"cache-control": "public, max-age=60"})
+
+    mocker.patch("browser.time.time", return_value=browser.time.time() + 61)
+    third = _route(url, "script")
+    asyncio.run(browser._lean_route_handler({"lean": True})(third))
+
+    third.fetch.assert_called_once()
+
+
+def test_lean_route_skips_disk_cache_for_uncacheable_responses():
+    for n, headers in enumerate([
+        {"cache-control": "max-age=0"},
+        {"cache-control": "private, max-age=600"},
+        {"vary": "Accept-Encoding, Cookie"},
+    ]):
+        second = _cache_twice(f"https://example.com/{n}.js", headers)
+        second.fetch.assert_called_once()
+
+    kept = _cache_twice("https://example.com/vary.js", {"vary": "Accept-Encoding"})
+    kept.fetch.assert_not_called()
@@ -1,5 +1,7 @@
 # tests/test_calendar.py
 from datetime import datetime, timezone, timedelta
+from unittest.mock import MagicMock
+
 from sources import calendar as cal_source
 
 CALENDAR_CONFIG = {
@@ -24,8 +26,10 @@ END:VEVENT
 END:VCALENDAR"""
 
 def test_fetch_returns_upcoming_events(mocker):
-    mock_get = mocker.patch("sources.calendar.requests.get")
+    mock_get = mocker.patch("sources.calendar.http_client.get")
     mock_get.return_value.raise_for_status = lambda: None
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {}
     mock_get.return_value.content = ICS_CONTENT
     # Freeze time to 2026-02-19
     mocker.patch("sources.calendar.datetime", wraps=datetime)
@@ -37,8 +41,10 @@ def test_fetch_returns_upcoming_events(mocker):
     assert "Team Meeting" in items[0].content
 
 def test_fetch_item_content_includes_datetime(mocker):
-    mock_get = mocker.patch("sources.calendar.requests.get")
+    mock_get = mocker.patch("sources.calendar.http_client.get")
     mock_get.return_value.raise_for_status = lambda: None
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.headers = {}
     mock_get.return_value.content = ICS_CONTENT
     # Freeze time to 2026-02-19
     mocker.patch("sources.calendar.datetime", wraps=datetime)
@@ -46,3 +52,113 @@ def test_fetch_item_content_includes_datetime(mocker):
     sources.calendar.datetime.now = lambda tz=None: datetime(2026, 2, 19, tzinfo=timezone.utc)
     items = cal_source.fetch(CALENDAR_CONFIG, browser=None)
     assert "2026-02-20" in items[0].content
+
+
+def _freeze(mocker, when: datetime):
+    mocker.patch("sources.calendar.datetime", wraps=datetime)
+    import sources.calendar
+    sources.calendar.datetime.now = lambda tz=None: when
+
+
+def _response(status_code: int, content: bytes = b"", headers: dict | None = None):
+    resp = MagicMock(status_code=status_code, content=content, headers=headers or {})
+    resp.raise_for_status = lambda: None
+    return resp
+
+
+def test_fetch_reuses_parsed_events_when_feed_not_modified(mocker):
+    _freeze(mocker, datetime(2026, 2, 19, tzinfo=timezone.utc))
+    mock_get = mocker.patch("sources.calendar.http_client.get", side_effect=[
+        _response(200, ICS_CONTENT, {"etag": '"v1"'}),
+        _response(304),
+    ])
+    from_ical = mocker.spy(cal_source.Calendar, "from_ical")
+
+    first = cal_source.fetch(CALENDAR_CONFIG, browser=None)
+    second = cal_source.fetch(CALENDAR_CONFIG, browser=None)
+
+    assert [i.id for i in second] == [i.id for i in first] == ["event-001@example.com"]
+    assert from_ical.call_count == 1
+    assert mock_get.call_args_list[0].kwargs["timeout"]
+    assert mock_get.call_args_list[1].kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+
+def test_fetch_reparses_when_window_passes_cached_horizon(mocker):
+    _freeze(mocker, datetime(2026, 2, 1, tzinfo=timezone.utc))
+    mock_get = mocker.patch("sources.calendar.http_client.get", side_effect=[
+        _response(200, ICS_CONTENT, {"etag": '"v1"'}),
+        _response(200, ICS_CONTENT, {"etag": '"v1"'}),
+    ])
+    config = {**CALENDAR_CONFIG, "cache_horizon_days": 0}
+
+    # The event is outside the first window and beyond the cached horizon.
+    assert cal_source.fetch(config, browser=None) == []
+    _freeze(mocker, datetime(2026, 2, 19, tzinfo=timezone.utc))
+    items = cal_source.fetch(config, browser=None)
+
+    assert [i.id for i in items] == ["event-001@example.com"]
+    # A conditional request could come back 304 with nothing cached to use.
+    assert mock_get.call_args_list[1].kwargs["headers"] == {}
+
+
+RECURRING_ICS = b"""BEGIN:VCALENDAR
+BEGIN:VEVENT
+UID:standup@example.com
+SUMMARY:Standup
+DTSTART;TZID=Europe/Berlin:20250106T090000
+RRULE:FREQ=WEEKLY;BYDAY=MO
+EXDATE;TZID=Europe/Berlin:20260302T090000
+END:VEVENT
+BEGIN:VEVENT
+UID:standup@example.com
+RECURRENCE-ID;TZID=Europe/Berlin:20260309T090000
+SUMMARY:Standup (moved)
+DTSTART;TZID=Europe/Berlin:20260310T100000
+END:VEVENT
+END:VCALENDAR"""
+
+
+def test_fetch_expands_recurrences_inside_window(mocker):
+    _freeze(mocker, datetime(2026, 2, 20, tzinfo=timezone.utc))
+    mocker.patch("sources.calendar.http_client.get", return_value=_response(200, RECURRING_ICS))
+
+    items = cal_source.fetch({**CALENDAR_CONFIG, "lookahead_days": 30}, browser=None)
+
+    assert [i.content.splitlines()[1] for i in items] == [
+        "2026-02-23 08:00 UTC",
+        # 2026-03-02 is excluded, 2026-03-09 moved to the 10th
+        "2026-03-10 09:00 UTC",
+        "2026-03-16 08:00 UTC",
+    ]
+    assert items[1].id == "standup@example.com/2026-03-09T08:00:00+00:00"
+    assert items[1].content.startswith("Standup (moved)")
+
+
+def test_fetch_merges_several_feeds_in_time_order(mocker):
+    _freeze(mocker, datetime(2026, 2, 19, tzinfo=timezone.utc))
+    other = b"""BEGIN:VCALENDAR
+BEGIN:VEVENT
+UID:dentist@example.com
+SUMMARY:Dentist
+DTSTART:20260219T150000Z
+END:VEVENT
+BEGIN:VEVENT
+UID:dinner@example.com
+SUMMARY:Dinner
+DTSTART:20260221T190000Z
+END:VEVENT
+END:VCALENDAR"""
+    responses = {"https://a.example/cal.ics": ICS_CONTENT, "https://b.example/cal.ics": other}
+    mocker.patch(
+        "sources.calendar.http_client.get",
+        side_effect=lambda url, **kwargs: _response(200, responses[url]),
+    )
+    config = {**CALENDAR_CONFIG, "ics_urls": list(responses)}
+
+    items = cal_source.fetch(config, browser=None)
+
+    assert [i.id for i in items] == [
+        "dentist@example.com",
+        "event-001@example.com",
+        "dinner@example.com",
+    ]
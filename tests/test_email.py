@@ -1,5 +1,7 @@
 # tests/test_email.py
 from sources import email as email_source
+import threading
+import time
 from unittest.mock import MagicMock, patch
 
 EMAIL_CONFIG = {
@@ -11,22 +13,270 @@ EMAIL_CONFIG = {
     "prompt": "summarize",
 }
 
-def test_fetch_returns_items(mocker):
+HEADERS_ITEM = b"BODY[HEADER.FIELDS (MESSAGE-ID SUBJECT FROM DATE)]"
+PLAIN_STRUCTURE = b'("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 8 1 NIL NIL NIL NIL)'
+# multipart/mixed( multipart/alternative(text/plain, text/html), application/pdf )
+MIXED_STRUCTURE = (
+    b'((("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "BASE64" 12 1 NIL NIL NIL NIL)'
+    b'("TEXT" "HTML" ("CHARSET" "utf-8") NIL NIL "7BIT" 30 1 NIL NIL NIL NIL)'
+    b' "ALTERNATIVE" ("BOUNDARY" "b2") NIL NIL NIL)'
+    b'("APPLICATION" "PDF" ("NAME" "a.pdf") NIL NIL "BASE64" 90000 NIL ("ATTACHMENT" ("FILENAME" "a.pdf")) NIL NIL)'
+    b' "MIXED" ("BOUNDARY" "b1") NIL NIL NIL)'
+)
+HTML_STRUCTURE = b'("TEXT" "HTML" ("CHARSET" "utf-8") NIL NIL "QUOTED-PRINTABLE" 60 2 NIL NIL NIL NIL)'
+
+
+def _header_response(messages: list[tuple[bytes, bytes, bytes]]) -> list:
+    """imaplib-shaped UID FETCH data for (uid, bodystructure, headers) triples.
+
+    Sequence numbers deliberately differ from UIDs.
+    """
+    data = []
+    for seq, (uid, structure, headers) in enumerate(messages, start=1):
+        prefix = b"%d (UID %s BODYSTRUCTURE %s %s {%d}" % (seq, uid, structure, HEADERS_ITEM, len(headers))
+        data.append((prefix, headers))
+        data.append(b")")
+    return data
+
+
+def _body_response(section: bytes, bodies: dict[bytes, bytes]) -> list:
+    data = []
+    for seq, (uid, body) in enumerate(bodies.items(), start=1):
+        data.append((b"%d (UID %s BODY[%s]<0> {%d}" % (seq, uid, section, len(body)), body))
+        data.append(b")")
+    return data
+
+
+def _mock_imap(search: bytes, fetches: list | None = None, uidvalidity=b"100", uidnext=None):
     mock_imap = MagicMock()
-    mock_imap.search.return_value = ("OK", [b"1 2"])
-    mock_imap.fetch.side_effect = [
-        ("OK", [(b"1", b"From: a@b.com\r\nSubject: Hello\r\nMessage-ID: <id1@x>\r\n\r\nBody one")]),
-        ("OK", [(b"2", b"From: c@d.com\r\nSubject: World\r\nMessage-ID: <id2@x>\r\n\r\nBody two")]),
-    ]
+    untagged = {"UIDVALIDITY": uidvalidity, "UIDNEXT": uidnext}
+    mock_imap.response.side_effect = lambda name: (name, [untagged.get(name)])
+    fetch_results = iter(fetches or [])
+    mock_imap.searches = []
+
+    def uid(command, *args):
+        if command == "SEARCH":
+            mock_imap.searches.append(args[1:])
+            return ("OK", [search])
+        return next(fetch_results)
+
+    mock_imap.uid.side_effect = uid
+    return mock_imap
+
+
+def _fetch_calls(mock_imap) -> list[tuple]:
+    return [c.args[1:] for c in mock_imap.uid.call_args_list if c.args[0] == "FETCH"]
+
+
+def _headers(message_id: str, subject: str, sender: str) -> bytes:
+    return f"Message-ID: {message_id}\r\nSubject: {subject}\r\nFrom: {sender}\r\n\r\n".encode()
+
+
+def test_fetch_returns_items(mocker):
+    mock_imap = _mock_imap(b"1 2", [
+        ("OK", _header_response([
+            (b"1", PLAIN_STRUCTURE, _headers("<id1@x>", "Hello", "a@b.com")),
+            (b"2", PLAIN_STRUCTURE, _headers("<id2@x>", "World", "c@d.com")),
+        ])),
+        ("OK", _body_response(b"1", {b"1": b"Body one", b"2": b"Body two"})),
+    ])
     mocker.patch("sources.email.imaplib.IMAP4_SSL", return_value=mock_imap)
     items = email_source.fetch(EMAIL_CONFIG, browser=None)
     assert len(items) == 2
     assert items[0].id == "<id1@x>"
     assert "Hello" in items[0].content
+    assert "Body two" in items[1].content
 
 def test_fetch_returns_empty_on_no_messages(mocker):
-    mock_imap = MagicMock()
-    mock_imap.search.return_value = ("OK", [b""])
+    mock_imap = _mock_imap(b"")
     mocker.patch("sources.email.imaplib.IMAP4_SSL", return_value=mock_imap)
     items = email_source.fetch(EMAIL_CONFIG, browser=None)
     assert items == []
+
+
+def test_fetch_batches_requests_and_peeks_only_text_parts(mocker):
+    mock_imap = _mock_imap(b"3 4 5", [
+        ("OK", _header_response([
+            (b"3", PLAIN_STRUCTURE, _headers("<a@x>", "A", "a@x")),
+            (b"4", MIXED_STRUCTURE, _headers("<b@x>", "B", "b@x")),
+            (b"5", PLAIN_STRUCTURE, _headers("<c@x>", "C", "c@x")),
+        ])),
+        ("OK", _body_response(b"1", {b"3": b"plain three", b"5": b"plain five"})),
+        # "Hello world!" base64, cut mid-quantum by the byte cap
+        ("OK", _body_response(b"1.1", {b"4": b"SGVsbG8gd29ybGQhAB"})),
+    ])
+    mocker.patch("sources.email.imaplib.IMAP4_SSL", return_value=mock_imap)
+
+    items = email_source.fetch({**EMAIL_CONFIG, "max_body_bytes": 18}, browser=None)
+
+    assert [i.id for i in items] == ["<a@x>", "<b@x>", "<c@x>"]
+    assert items[1].content.endswith("Hello world!")
+    requests = _fetch_calls(mock_imap)
+    assert requests[0][0] == "3:5"
+    assert requests[1] == ("3,5", "(UID BODY.PEEK[1]<0.18>)")
+    assert requests[2] == ("4", "(UID BODY.PEEK[1.1]<0.18>)")
+    assert all("PEEK" in r[1] for r in requests)
+
+
+def test_fetch_converts_html_only_messages_to_text(mocker):
+    html = b"<html><head><style>p{}</style></head><body><p>Caf=C3=A9 menu</p><p>Soup</p></body></html>"
+    mock_imap = _mock_imap(b"7", [
+        ("OK", _header_response([(b"7", HTML_STRUCTURE, _headers("<h@x>", "Menu", "h@x"))])),
+        ("OK", _body_response(b"1", {b"7": html})),
+    ])
+    mocker.patch("sources.email.imaplib.IMAP4_SSL", return_value=mock_imap)
+
+    items = email_source.fetch(EMAIL_CONFIG, browser=None)
+
+    assert items[0].content.endswith("Café menu\nSoup")
+
+
+def test_fetch_only_searches_uids_after_last_run(mocker):
+    first = _mock_imap(b"8", [
+        ("OK", _header_response([(b"8", PLAIN_STRUCTURE, _headers("<8@x>", "Eight", "a@x"))])),
+        ("OK", _body_response(b"1", {b"8": b"eight"})),
+    ], uidnext=b"12")
+    # "12:*" still matches the newest message (UID 11) when nothing is newer
+    second = _mock_imap(b"11")
+    mocker.patch("sources.email.imaplib.IMAP4_SSL", side_effect=[first, second])
+
+    items = email_source.fetch(EMAIL_CONFIG, browser=None)
+    assert [i.id for i in items] == ["<8@x>"]
+    email_source.commit(items)
+    assert email_source.fetch(EMAIL_CONFIG, browser=None) == []
+
+    assert first.searches == [("UNSEEN",)]
+    assert second.searches == [("UNSEEN", "UID 12:*")]
+    assert _fetch_calls(second) == []
+
+
+def test_fetch_keeps_uids_until_items_are_committed(mocker):
+    def connection():
+        return _mock_imap(b"8", [
+            ("OK", _header_response([(b"8", PLAIN_STRUCTURE, _headers("<8@x>", "Eight", "a@x"))])),
+            ("OK", _body_response(b"1", {b"8": b"eight"})),
+        ], uidnext=b"12")
+
+    first, second = connection(), connection()
+    mocker.patch("sources.email.imaplib.IMAP4_SSL", side_effect=[first, second])
+
+    email_source.fetch(EMAIL_CONFIG, browser=None)
+    # the summary failed, so main commits without the item
+    email_source.commit([])
+    items = email_source.fetch(EMAIL_CONFIG, browser=None)
+
+    assert second.searches == [("UNSEEN",)]
+    assert [i.id for i in items] == ["<8@x>"]
+
+
+def test_fetch_resyncs_when_uidvalidity_changes(mocker):
+    first = _mock_imap(b"", uidnext=b"50")
+    second = _mock_imap(b"", uidvalidity=b"200", uidnext=b"3")
+    third = _mock_imap(b"", uidvalidity=b"200")
+    mocker.patch("sources.email.imaplib.IMAP4_SSL", side_effect=[first, second, third])
+
+    for _ in range(3):
+        email_source.commit(email_source.fetch(EMAIL_CONFIG, browser=None))
+
+    assert second.searches == [("UNSEEN",)]
+    assert third.searches == [("UNSEEN", "UID 3:*")]
+
+
+def test_fetch_reuses_one_connection_across_folders(mocker):
+    message = _header_response([(b"5", PLAIN_STRUCTURE, _headers("<same@x>", "Hi", "a@x"))])
+    body = _body_response(b"1", {b"5": b"hi"})
+    mock_imap = _mock_imap(b"5", [("OK", message), ("OK", body), ("OK", message), ("OK", body)])
+    connect = mocker.patch("sources.email.imaplib.IMAP4_SSL", return_value=mock_imap)
+    config = {**EMAIL_CONFIG, "mailboxes": ["INBOX", "Archive"], "max_connections_per_host": 1}
+
+    items = email_source.fetch(config, browser=None)
+
+    assert connect.call_count == 1
+    assert mock_imap.login.call_count == 1
+    assert [c.args[0] for c in mock_imap.select.call_args_list] == ["INBOX", "Archive"]
+    # the same message in two folders is summarized once
+    assert [i.id for i in items] == ["<same@x>"]
+
+
+def test_fetch_caps_connections_per_host(mocker):
+    lock = threading.Lock()
+    open_connections = []
+    peak = []
+
+    def connect(host, port):
+        mock_imap = _mock_imap(b"")
+
+        def login(user, password):
+            with lock:
+                open_connections.append(host)
+                peak.append(open_connections.count(host))
+            time.sleep(0.05)
+
+        def logout():
+            with lock:
+                open_connections.remove(host)
+
+        mock_imap.login.side_effect = login
+        mock_imap.logout.side_effect = logout
+        return mock_imap
+
+    connect_mock = mocker.patch("sources.email.imaplib.IMAP4_SSL", side_effect=connect)
+    config = {
+        **EMAIL_CONFIG,
+        "max_connections_per_host": 2,
+        "accounts": [
+            {"username": "a@example.com", "mailboxes": ["INBOX", "Work", "Lists"]},
+            {"username": "b@example.com"},
+            {"username": "c@other.com", "host": "imap.other.com"},
+        ],
+    }
+
+    assert email_source.fetch(config, browser=None) == []
+
+    assert max(peak) == 2
+    hosts = [c.args[0] for c in connect_mock.call_args_list]
+    assert hosts.count("imap.other.com") == 1
+    assert hosts.count("imap.example.com") <= 3
+
+
+def _thread_headers(message_id: str, date: str, in_reply_to: str = "", references: str = "") -> bytes:
+    headers = f"Message-ID: {message_id}\r\nSubject: Plans\r\nFrom: {message_id[1]}@x\r\nDate: {date}\r\n"
+    if in_reply_to:
+        headers += f"In-Reply-To: {in_reply_to}\r\n"
+    if references:
+        headers += f"References: {references}\r\n"
+    return (headers + "\r\n").encode()
+
+
+def test_fetch_collapses_threads_and_strips_quotes(mocker):
+    reply = b"Sounds good.\r\n\r\nOn Mon, 1 Jan 2024, a@x wrote:\r\n> Lunch at noon?\r\n"
+    mock_imap = _mock_imap(b"1 2 3 4", [
+        ("OK", _header_response([
+            (b"1", PLAIN_STRUCTURE, _thread_headers("<a@x>", "Mon, 1 Jan 2024 10:00:00 +0000")),
+            (b"2", PLAIN_STRUCTURE, _thread_headers(
+                "<c@x>", "Mon, 1 Jan 2024 12:00:00 +0000", "<b@x>", "<a@x> <b@x>"
+            )),
+            (b"3", PLAIN_STRUCTURE, _thread_headers(
+                "<b@x>", "Mon, 1 Jan 2024 11:00:00 +0000", "<a@x>"
+            )),
+            (b"4", PLAIN_STRUCTURE, _headers("<z@x>", "Other", "z@x")),
+        ])),
+        ("OK", _body_response(b"1", {
+            b"1": b"Lunch at noon?\r\n-- \r\nA, sent from my phone",
+            b"2": b"See you there.\r\n> Sounds good.",
+            b"3": reply,
+            b"4": b"Unrelated",
+        })),
+    ])
+    mocker.patch("sources.email.imaplib.IMAP4_SSL", return_value=mock_imap)
+
+    items = email_source.fetch(EMAIL_CONFIG, browser=None)
+
+    assert len(items) == 2
+    thread = next(i for i in items if i.id != "<z@x>")
+    assert thread.content == (
+        "Subject: Plans\nMessages: 3\n\n"
+        "From: a@x\nLunch at noon?\n\n"
+        "From: b@x\nSounds good.\n\n"
+        "From: c@x\nSee you there."
+    )
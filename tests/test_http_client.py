@@ -0,0 +1,38 @@
+# tests/test_http_client.py
+import threading
+
+import requests
+
+import http_client
+
+
+def _ok_response() -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.url = "https://example.com/"
+    return resp
+
+
+def test_requests_get_default_timeout(mocker):
+    send = mocker.patch("requests.adapters.HTTPAdapter.send", return_value=_ok_response())
+    http_client.get("https://example.com/")
+    assert send.call_args.kwargs["timeout"] == http_client.DEFAULT_TIMEOUT
+
+
+def test_explicit_timeout_is_kept(mocker):
+    send = mocker.patch("requests.adapters.HTTPAdapter.send", return_value=_ok_response())
+    http_client.post("https://example.com/", json={}, timeout=3)
+    assert send.call_args.kwargs["timeout"] == 3
+
+
+def test_threads_get_own_session_on_shared_pools():
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(http_client.session()))
+    thread.start()
+    thread.join()
+
+    assert http_client.session() is http_client.session()
+    assert sessions[0] is not http_client.session()
+    assert sessions[0].get_adapter("https://a.example") is http_client.session().get_adapter(
+        "https://b.example"
+    )
@@ -7,7 +7,7 @@ def make_item(content: str) -> Item:
     return Item(id="1", source="test", content=content, timestamp="2026-01-01T00:00:00")
 
 def test_summarize_returns_string(mocker):
-    mock_post = mocker.patch("llm.requests.post")
+    mock_post = mocker.patch("llm.http_client.post")
     mock_post.return_value.json.return_value = {"response": "A summary."}
     mock_post.return_value.raise_for_status = lambda: None
 
@@ -20,7 +20,7 @@ def test_summarize_returns_string(mocker):
 
 def test_summarize_raises_on_connection_error(mocker):
     import requests
-    mocker.patch("llm.requests.post", side_effect=requests.ConnectionError)
+    mocker.patch("llm.http_client.post", side_effect=requests.ConnectionError)
     with pytest.raises(requests.ConnectionError):
         llm.summarize(
             items=[make_item("x")],
@@ -30,7 +30,7 @@ def test_summarize_raises_on_connection_error(mocker):
 
 
 def test_summarize_uses_configured_timeout(mocker):
-    mock_post = mocker.patch("llm.requests.post")
+    mock_post = mocker.patch("llm.http_client.post")
     mock_post.return_value.json.return_value = {"response": "ok"}
     mock_post.return_value.raise_for_status = lambda: None
 
@@ -44,7 +44,7 @@ def test_summarize_uses_configured_timeout(mocker):
 
 
 def test_summarize_defaults_timeout_to_120(mocker):
-    mock_post = mocker.patch("llm.requests.post")
+    mock_post = mocker.patch("llm.http_client.post")
     mock_post.return_value.json.return_value = {"response": "ok"}
     mock_post.return_value.raise_for_status = lambda: None
 
@@ -55,3 +55,142 @@ def test_summarize_defaults_timeout_to_120(mocker):
     )
 
     assert mock_post.call_args.kwargs["timeout"] == 120
+
+
+def _mock_ollama(mocker, text: str = "A summary."):
+    mock_post = mocker.patch("llm.http_client.post")
+    mock_post.return_value.json.return_value = {"response": text}
+    mock_post.return_value.raise_for_status = lambda: None
+    return mock_post
+
+
+CONFIG = {"base_url": "http://localhost:11434", "model": "llama3.2"}
+
+
+def test_summarize_reuses_cached_response_for_identical_input(mocker):
+    mock_post = _mock_ollama(mocker)
+
+    first = llm.summarize([make_item("same")], "p", CONFIG)
+    second = llm.summarize([make_item("same")], "p", CONFIG)
+
+    assert first == second == "A summary."
+    assert mock_post.call_count == 1
+
+
+def test_summarize_cache_key_covers_content_and_options(mocker):
+    mock_post = _mock_ollama(mocker)
+
+    llm.summarize([make_item("a")], "p", CONFIG)
+    llm.summarize([make_item("b")], "p", CONFIG)
+    llm.summarize([make_item("a")], "p", CONFIG, {"temperature": 0.2})
+    llm.summarize([make_item("a")], "p", {**CONFIG, "model": "other"})
+
+    assert mock_post.call_count == 4
+
+
+def test_summarize_cache_can_be_disabled_and_expires(mocker):
+    mock_post = _mock_ollama(mocker)
+
+    for _ in range(2):
+        llm.summarize([make_item("x")], "p", {**CONFIG, "response_cache": False})
+    for _ in range(2):
+        llm.summarize([make_item("y")], "p", {**CONFIG, "response_cache_ttl_hours": 0})
+
+    assert mock_post.call_count == 4
+
+
+def test_response_cache_evicts_oldest_entries(mocker, isolated_cache_dir):
+    _mock_ollama(mocker)
+    config = {**CONFIG, "response_cache_max_entries": 2}
+
+    for content in ("a", "b", "c"):
+        llm.summarize([make_item(content)], "p", config)
+
+    assert len(list((isolated_cache_dir / "llm").glob("*.json"))) == 2
+
+
+def test_summarize_map_reduces_input_larger_than_context(mocker):
+    prompts = []
+
+    def post(url, json, timeout):
+        prompts.append(json["prompt"])
+        resp = mocker.MagicMock()
+        resp.raise_for_status = lambda: None
+        resp.json.return_value = {"response": f"partial {len(prompts)}"}
+        return resp
+
+    mocker.patch("llm.http_client.post", side_effect=post)
+    config = {**CONFIG, "num_ctx": 1024, "response_tokens": 256}
+    items = [make_item(f"article {n} " + "word " * 500) for n in range(4)]
+
+    result = llm.summarize(items, "Summarize.", config)
+
+    map_prompts, reduce_prompt = prompts[:-1], prompts[-1]
+    assert len(map_prompts) > 1
+    assert all(llm.estimate_tokens(p) <= 1024 - 256 for p in map_prompts)
+    for n in range(4):
+        assert any(f"article {n} " in p for p in map_prompts)
+    assert reduce_prompt.startswith(llm.REDUCE_PROMPT.format(prompt="Summarize."))
+    assert all(f"partial {n}" in reduce_prompt for n in range(1, len(map_prompts) + 1))
+    assert result == f"partial {len(prompts)}"
+
+
+def test_pack_splits_oversized_text_without_dropping_any():
+    text = " ".join(f"w{n}" for n in range(2000))
+    chunks = llm._pack([text, "tail"], budget=300)
+
+    assert len(chunks) > 1
+    assert all(llm.estimate_tokens(c) <= 301 for c in chunks)
+    assert " ".join(" ".join(chunks).split()) == f"{text} tail"
+
+
+def test_generate_goes_through_scheduler_with_source_priority(mocker):
+    _mock_ollama(mocker)
+    slot = mocker.spy(llm.scheduler.ollama, "slot")
+
+    llm.summarize([make_item("x")], "p", {**CONFIG, "max_parallel": 3}, {"priority": 5})
+
+    slot.assert_called_once_with(3, 5)
+
+
+def test_summarize_batch_splits_response_per_item(mocker):
+    mock_post = _mock_ollama(
+        mocker, "=== ITEM 1 ===\nFirst summary.\n\n**=== ITEM 2 ===**\nSecond summary."
+    )
+    items = [
+        Item(id="a", source="news", content="one", timestamp="t"),
+        Item(id="b", source="news", content="two", timestamp="t"),
+    ]
+
+    result = llm.summarize_batch(items, "Summarize.", CONFIG)
+
+    assert result == {"a": "First summary.", "b": "Second summary."}
+    prompt = mock_post.call_args.kwargs["json"]["prompt"]
+    assert "=== ITEM 1 ===\none" in prompt and "=== ITEM 2 ===\ntwo" in prompt
+
+
+def test_summarize_batch_raises_when_an_item_is_missing(mocker):
+    _mock_ollama(mocker, "=== ITEM 1 ===\nOnly one.")
+    items = [make_item("one"), make_item("two")]
+
+    with pytest.raises(llm.BatchParseError):
+        llm.summarize_batch(items, "Summarize.", CONFIG)
+
+
+def test_batch_items_respects_size_and_context_budget():
+    small = [make_item("short") for _ in range(5)]
+    assert [len(b) for b in llm.batch_items(small, "p", CONFIG, batch_size=2)] == [2, 2, 1]
+
+    big = [make_item("word " * 1500) for _ in range(3)]
+    config = {**CONFIG, "num_ctx": 4096}
+    assert [len(b) for b in llm.batch_items(big, "p", config, batch_size=5)] == [1, 1, 1]
+
+
+def test_batch_items_reserves_response_tokens_per_item():
+    # ~250 tokens each: six fit the input budget alone, but not with 512 reply tokens apiece
+    items = [make_item("word " * 200) for _ in range(6)]
+    config = {**CONFIG, "num_ctx": 4096, "response_tokens": 512}
+
+    batches = llm.batch_items(items, "p", config, batch_size=6)
+
+    assert [len(b) for b in batches] == [5, 1]
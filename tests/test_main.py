@@ -25,7 +25,7 @@ CONFIG = {
 def _mock_ollama_ok(mocker):
     mock_resp = MagicMock()
     mock_resp.raise_for_status = MagicMock()
-    return mocker.patch("main.requests.get", return_value=mock_resp)
+    return mocker.patch("main.http_client.get", return_value=mock_resp)
 
 
 def test_run_skips_disabled_sources(mocker):
@@ -36,7 +36,7 @@ def test_run_skips_disabled_sources(mocker):
     mocker.patch("main.cache.mark_seen")
     mock_summarize = mocker.patch("main.llm.summarize", return_value="weather summary")
     mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     main.run(config_path="config.yaml")
     assert mock_summarize.call_count == 1  # only weather, not email
@@ -49,7 +49,7 @@ def test_run_skips_source_with_no_new_items(mocker):
     mocker.patch("main.cache.filter_new", return_value=[])  # all seen
     mock_summarize = mocker.patch("main.llm.summarize", return_value="summary")
     mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     main.run(config_path="config.yaml")
     mock_summarize.assert_not_called()
@@ -62,7 +62,7 @@ def test_run_source_error_does_not_abort(mocker):
     mocker.patch("main.cache.filter_new", return_value=[])
     mocker.patch("main.llm.summarize", return_value="summary")
     mock_send = mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     main.run(config_path="config.yaml")  # should not raise
 
@@ -71,8 +71,8 @@ def test_run_raises_if_ollama_unreachable(mocker):
     mocker.patch("main.config.load", return_value=CONFIG)
     import requests
 
-    mocker.patch("main.requests.get", side_effect=requests.ConnectionError("refused"))
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.http_client.get", side_effect=requests.ConnectionError("refused"))
+    mocker.patch("main.browser.async_playwright")
 
     with pytest.raises(RuntimeError, match="Ollama is not reachable"):
         main.run(config_path="config.yaml")
@@ -93,7 +93,7 @@ def test_run_bypasses_cache_when_disabled(mocker):
     mock_mark = mocker.patch("main.cache.mark_seen")
     mocker.patch("main.llm.summarize", return_value="summary")
     mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     main.run(config_path="config.yaml")
 
@@ -107,7 +107,7 @@ def test_run_does_not_send_telegram_if_no_new_items(mocker):
     mocker.patch("main.sources.weather.fetch", return_value=[make_item("weather")])
     mocker.patch("main.cache.filter_new", return_value=[])  # nothing new
     mock_send = mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     main.run(config_path="config.yaml")
     mock_send.assert_not_called()
@@ -128,7 +128,7 @@ def test_run_summarizes_when_flag_set(mocker):
         "main.summarizer.summarize", return_value="compressed summary"
     )
     mock_send = mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     main.run(config_path="config.yaml")
 
@@ -151,7 +151,7 @@ def test_run_skips_summarize_when_messages_mode(mocker):
     mocker.patch("main.llm.summarize", return_value="weather summary")
     mock_sum = mocker.patch("main.summarizer.summarize")
     mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     main.run(config_path="config.yaml")
 
@@ -171,7 +171,7 @@ def test_run_skips_summarize_when_flag_false(mocker):
     mocker.patch("main.llm.summarize", return_value="weather summary")
     mock_sum = mocker.patch("main.summarizer.summarize")
     mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     main.run(config_path="config.yaml")
 
@@ -192,7 +192,7 @@ def test_run_llm_source_timeout_does_not_abort(mocker):
 
     mocker.patch("main.llm.summarize", side_effect=requests.Timeout("timed out"))
     mock_send = mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     main.run(config_path="config.yaml")
 
@@ -214,7 +214,7 @@ def test_run_llm_timeout_logs_warning_not_error(mocker, caplog):
     mocker.patch("main.sources.weather.fetch", return_value=[make_item("weather")])
     mocker.patch("main.llm.summarize", side_effect=requests.Timeout("timed out"))
     mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     with caplog.at_level(logging.WARNING, logger="__main__"):
         main.run(config_path="config.yaml")
@@ -241,7 +241,7 @@ def test_run_news_summarizes_each_item_individually(mocker):
     mocker.patch("main.sources.news.fetch", return_value=items)
     mock_summarize = mocker.patch("main.llm.summarize", side_effect=["summary 1", "summary 2"])
     mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     main.run(config_path="config.yaml")
 
@@ -270,7 +270,7 @@ def test_run_news_joined_summaries_reach_composer(mocker):
     mocker.patch("main.llm.summarize", side_effect=["summary 1", "summary 2"])
     mock_compose = mocker.patch("main.composer.compose", return_value=["composed text"])
     mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     main.run(config_path="config.yaml")
 
@@ -291,7 +291,7 @@ def test_run_falls_back_when_final_summarizer_fails(mocker):
     mocker.patch("main.llm.summarize", return_value="weather summary")
     mocker.patch("main.summarizer.summarize", side_effect=Exception("ollama timeout"))
     mock_send = mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     main.run(config_path="config.yaml")
 
@@ -318,7 +318,7 @@ def test_run_non_browser_sources_in_parallel(mocker):
     mock_email = mocker.patch("main.sources.email.fetch", return_value=[make_item("email")])
     mocker.patch("main.llm.summarize", return_value="summary")
     mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     main.run(config_path="config.yaml")
 
@@ -344,10 +344,164 @@ def test_run_browser_sources_not_run_via_thread_pool(mocker):
     mocker.patch("main.sources.news.fetch", return_value=[make_item("news")])
     mocker.patch("main.llm.summarize", return_value="news summary")
     mocker.patch("main.telegram.send")
-    mocker.patch("main.sync_playwright")
+    mocker.patch("main.browser.async_playwright")
 
     main.run(config_path="config.yaml")
 
     # _run_source should only be called for weather, not news
     assert mock_run_source.call_count == 1
     assert mock_run_source.call_args.args[0] == "weather"
+
+
+def test_run_browser_sources_overlap_with_non_browser_sources(mocker):
+    """Browser scraping must start while non-browser sources are still running."""
+    import threading
+
+    cfg = {
+        "ollama": {"base_url": "http://localhost:11434", "model": "llama3.2"},
+        "telegram": {"bot_token": "tok", "chat_id": "123"},
+        "sources": {
+            "weather": {"enabled": True, "cache": False, "prompt": "p"},
+            "news": {"enabled": True, "cache": False, "prompt": "p"},
+        },
+        "compose": {"order": ["weather", "news"]},
+    }
+    mocker.patch("main.config.load", return_value=cfg)
+    _mock_ollama_ok(mocker)
+    news_started = threading.Event()
+
+    def slow_weather(source_cfg, browser):
+        assert news_started.wait(timeout=5), "news scraping did not overlap weather"
+        return [make_item("weather")]
+
+    def news_fetch(source_cfg, browser):
+        news_started.set()
+        return [make_item("news")]
+
+    mocker.patch("main.sources.weather.fetch", side_effect=slow_weather)
+    mocker.patch("main.sources.news.fetch", side_effect=news_fetch)
+    mocker.patch("main.llm.summarize", return_value="summary")
+    mock_compose = mocker.patch("main.composer.compose", return_value=["composed"])
+    mocker.patch("main.telegram.send")
+    mocker.patch("main.browser.async_playwright")
+
+    main.run(config_path="config.yaml")
+
+    assert set(mock_compose.call_args.args[0]) == {"weather", "news"}
+
+
+def test_run_renders_template_sources_without_llm(mocker):
+    cfg = {
+        **CONFIG,
+        "sources": {
+            "weather": {"enabled": True, "render": "template", "template": "{content}!"},
+        },
+    }
+    mocker.patch("main.config.load", return_value=cfg)
+    _mock_ollama_ok(mocker)
+    mocker.patch("main.sources.weather.fetch", return_value=[make_item("weather")])
+    mocker.patch("main.cache.filter_new", return_value=[make_item("weather")])
+    mocker.patch("main.cache.mark_seen")
+    mock_summarize = mocker.patch("main.llm.summarize")
+    mock_send = mocker.patch("main.telegram.send")
+    mocker.patch("main.browser.async_playwright")
+
+    main.run(config_path="config.yaml")
+
+    mock_summarize.assert_not_called()
+    assert "stuff!" in mock_send.call_args[0][0]
+
+
+NEWS_BATCH_CFG = {
+    "ollama": {"base_url": "http://localhost:11434", "model": "llama3.2"},
+    "telegram": {"bot_token": "tok", "chat_id": "123"},
+    "sources": {
+        "news": {"enabled": True, "prompt": "summarize news", "batch_size": 5},
+    },
+    "compose": {"order": ["news"]},
+}
+NEWS_ITEMS = [
+    Item(id="a", source="news", content="article 1", timestamp="2026-01-01T00:00:00"),
+    Item(id="b", source="news", content="article 2", timestamp="2026-01-01T00:00:00"),
+]
+
+
+def test_run_news_batch_mode_summarizes_items_in_one_call(mocker):
+    mocker.patch("main.config.load", return_value=NEWS_BATCH_CFG)
+    _mock_ollama_ok(mocker)
+    mocker.patch("main.sources.news.fetch", return_value=NEWS_ITEMS)
+    mocker.patch("main.cache.filter_new", return_value=NEWS_ITEMS)
+    mock_mark_seen = mocker.patch("main.cache.mark_seen")
+    mock_batch = mocker.patch(
+        "main.llm.summarize_batch", return_value={"a": "summary 1", "b": "summary 2"}
+    )
+    mock_summarize = mocker.patch("main.llm.summarize")
+    mock_compose = mocker.patch("main.composer.compose", return_value=["composed text"])
+    mocker.patch("main.telegram.send")
+    mocker.patch("main.browser.async_playwright")
+
+    main.run(config_path="config.yaml")
+
+    mock_batch.assert_called_once()
+    assert mock_batch.call_args.args[0] == NEWS_ITEMS
+    mock_summarize.assert_not_called()
+    assert mock_compose.call_args.args[0]["news"] == "summary 1\n\nsummary 2"
+    assert mock_mark_seen.call_args.args[0] == NEWS_ITEMS
+
+
+def test_run_news_batch_falls_back_per_item_and_tracks_partial_success(mocker):
+    mocker.patch("main.config.load", return_value=NEWS_BATCH_CFG)
+    _mock_ollama_ok(mocker)
+    mocker.patch("main.sources.news.fetch", return_value=NEWS_ITEMS)
+    mocker.patch("main.cache.filter_new", return_value=NEWS_ITEMS)
+    mock_mark_seen = mocker.patch("main.cache.mark_seen")
+    mocker.patch("main.llm.summarize_batch", side_effect=main.llm.BatchParseError("no item 2"))
+    mock_summarize = mocker.patch(
+        "main.llm.summarize", side_effect=["summary 1", Exception("ollama error")]
+    )
+    mocker.patch("main.telegram.send")
+    mocker.patch("main.browser.async_playwright")
+
+    main.run(config_path="config.yaml")
+
+    assert [c.args[0] for c in mock_summarize.call_args_list] == [[NEWS_ITEMS[0]], [NEWS_ITEMS[1]]]
+    assert mock_mark_seen.call_args.args[0] == [NEWS_ITEMS[0]]
+
+
+def test_run_commits_source_state_only_after_summary(mocker):
+    mocker.patch("main.config.load", return_value=CONFIG)
+    _mock_ollama_ok(mocker)
+    items = [make_item("weather")]
+    mocker.patch("main.sources.weather.fetch", return_value=items)
+    mocker.patch("main.cache.filter_new", return_value=items)
+    mocker.patch("main.cache.mark_seen")
+    commit = mocker.patch("main.sources.weather.commit", create=True)
+    mocker.patch("main.telegram.send")
+    mocker.patch("main.browser.async_playwright")
+
+    mocker.patch("main.llm.summarize", side_effect=Exception("ollama error"))
+    main.run(config_path="config.yaml")
+    commit.assert_not_called()
+
+    mocker.patch("main.llm.summarize", return_value="weather summary")
+    main.run(config_path="config.yaml")
+    commit.assert_called_once_with(items)
+
+
+def test_run_commits_cached_items_along_with_new_ones(mocker):
+    mocker.patch("main.config.load", return_value=CONFIG)
+    _mock_ollama_ok(mocker)
+    cached = Item(id="old", source="weather", content="old", timestamp="t")
+    new = Item(id="new", source="weather", content="new", timestamp="t")
+    mocker.patch("main.sources.weather.fetch", return_value=[new, cached])
+    mocker.patch("main.cache.filter_new", return_value=[new])
+    mock_mark_seen = mocker.patch("main.cache.mark_seen")
+    commit = mocker.patch("main.sources.weather.commit", create=True)
+    mocker.patch("main.llm.summarize", return_value="weather summary")
+    mocker.patch("main.telegram.send")
+    mocker.patch("main.browser.async_playwright")
+
+    main.run(config_path="config.yaml")
+
+    assert mock_mark_seen.call_args.args[0] == [new]
+    assert {i.id for i in commit.call_args.args[0]} == {"old", "new"}
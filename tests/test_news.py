@@ -1,87 +1,276 @@
 # tests/test_news.py
+import asyncio
+
+import pytest
+
 from sources import news
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 NEWS_CONFIG = {
     "urls": ["https://example.com/news"],
     "prompt": "summarize",
+    # Extract on a thread so the patched trafilatura.extract is the one used.
+    "extract_workers": 0,
 }
 
+
+@pytest.fixture(autouse=True)
+def mock_http_session(mocker):
+    """No network in tests; the HTTP fast path sees an empty page by default."""
+    session = mocker.patch("sources.news.http_client")
+    session.get.return_value = MagicMock(text="<html></html>", status_code=200, headers={})
+    return session
+
+
 def test_fetch_returns_one_item_per_url(mocker):
-    mock_page = MagicMock()
+    mock_page = AsyncMock()
+    mock_page.goto.return_value = None
+    mock_page.content.return_value = "<html></html>"
     mock_page.inner_text.return_value = "Big story today. Another headline."
-    mock_context = MagicMock()
+    mock_context = AsyncMock()
     mock_context.new_page.return_value = mock_page
-    mock_browser = MagicMock()
+    mock_browser = AsyncMock()
     mock_browser.new_context.return_value = mock_context
     mocker.patch("sources.news.trafilatura.extract", return_value=None)
 
-    items = news.fetch(NEWS_CONFIG, browser=mock_browser)
+    items = asyncio.run(news.fetch(NEWS_CONFIG, browser=mock_browser))
     assert len(items) == 1
     assert "Big story today" in items[0].content
 
-def test_fetch_item_id_is_url_hash(mocker):
-    import hashlib
-    mock_page = MagicMock()
-    mock_page.inner_text.return_value = "content"
-    mock_context = MagicMock()
+def test_fetch_item_id_changes_with_page_content(mocker):
+    mock_page = AsyncMock()
+    mock_page.goto.return_value = None
+    mock_page.content.return_value = "<html></html>"
+    mock_page.inner_text.side_effect = ["first version", "second version"]
+    mock_context = AsyncMock()
     mock_context.new_page.return_value = mock_page
-    mock_browser = MagicMock()
+    mock_browser = AsyncMock()
     mock_browser.new_context.return_value = mock_context
     mocker.patch("sources.news.trafilatura.extract", return_value=None)
 
-    items = news.fetch(NEWS_CONFIG, browser=mock_browser)
-    expected_id = hashlib.md5("https://example.com/news".encode()).hexdigest()
-    assert items[0].id == expected_id
+    first = asyncio.run(news.fetch(NEWS_CONFIG, browser=mock_browser))
+    second = asyncio.run(news.fetch(NEWS_CONFIG, browser=mock_browser))
+
+    assert first[0].id != second[0].id
+    assert second[0].content == "second version"
 
 def test_fetch_skips_failed_url(mocker):
-    mock_page = MagicMock()
+    mock_page = AsyncMock()
+    mock_page.goto.return_value = None
     mock_page.goto.side_effect = Exception("timeout")
-    mock_context = MagicMock()
+    mock_context = AsyncMock()
     mock_context.new_page.return_value = mock_page
-    mock_browser = MagicMock()
+    mock_browser = AsyncMock()
     mock_browser.new_context.return_value = mock_context
     mocker.patch("sources.news.trafilatura.extract", return_value=None)
 
-    items = news.fetch(NEWS_CONFIG, browser=mock_browser)
+    items = asyncio.run(news.fetch(NEWS_CONFIG, browser=mock_browser))
     assert items == []
 
 def test_fetch_caps_content_at_8000_chars(mocker):
-    mock_page = MagicMock()
+    mock_page = AsyncMock()
+    mock_page.goto.return_value = None
+    mock_page.content.return_value = "<html></html>"
     mock_page.inner_text.return_value = "x" * 10000
-    mock_context = MagicMock()
+    mock_context = AsyncMock()
     mock_context.new_page.return_value = mock_page
-    mock_browser = MagicMock()
+    mock_browser = AsyncMock()
     mock_browser.new_context.return_value = mock_context
     mocker.patch("sources.news.trafilatura.extract", return_value=None)
 
-    items = news.fetch(NEWS_CONFIG, browser=mock_browser)
+    items = asyncio.run(news.fetch(NEWS_CONFIG, browser=mock_browser))
     assert len(items[0].content) == 8000
 
 def test_scrape_uses_trafilatura_when_available(mocker):
-    mock_page = MagicMock()
+    mock_page = AsyncMock()
+    mock_page.goto.return_value = None
     mock_page.content.return_value = "<html><body><article>Clean article text</article></body></html>"
     mock_page.inner_text.return_value = "Nav junk | Clean article text | Footer ads"
-    mock_context = MagicMock()
+    mock_context = AsyncMock()
     mock_context.new_page.return_value = mock_page
-    mock_browser = MagicMock()
+    mock_browser = AsyncMock()
     mock_browser.new_context.return_value = mock_context
 
     mocker.patch("sources.news.trafilatura.extract", return_value="Clean article text")
 
-    items = news.fetch(NEWS_CONFIG, browser=mock_browser)
+    items = asyncio.run(news.fetch(NEWS_CONFIG, browser=mock_browser))
     assert items[0].content == "Clean article text"
 
 def test_scrape_falls_back_to_inner_text_when_trafilatura_returns_none(mocker):
-    mock_page = MagicMock()
+    mock_page = AsyncMock()
+    mock_page.goto.return_value = None
     mock_page.content.return_value = "<html><body>sparse</body></html>"
     mock_page.inner_text.return_value = "fallback text"
-    mock_context = MagicMock()
+    mock_context = AsyncMock()
     mock_context.new_page.return_value = mock_page
-    mock_browser = MagicMock()
+    mock_browser = AsyncMock()
     mock_browser.new_context.return_value = mock_context
 
     mocker.patch("sources.news.trafilatura.extract", return_value=None)
 
-    items = news.fetch(NEWS_CONFIG, browser=mock_browser)
+    items = asyncio.run(news.fetch(NEWS_CONFIG, browser=mock_browser))
     assert items[0].content == "fallback text"
+
+def test_fetch_scrapes_pages_concurrently_up_to_max_pages(mocker):
+    urls = [f"https://example.com/{i}" for i in range(6)]
+    open_pages = 0
+    peak = 0
+
+    async def goto(url, **kwargs):
+        nonlocal open_pages, peak
+        open_pages += 1
+        peak = max(peak, open_pages)
+        # Later URLs finish first, so ordering cannot come from completion order.
+        await asyncio.sleep(0.001 * (10 - int(url.rsplit("/", 1)[1])))
+        open_pages -= 1
+        if url.endswith("/3"):
+            raise Exception("timeout")
+        return None
+
+    def new_page():
+        page = AsyncMock()
+        page.goto.side_effect = goto
+        page.content.return_value = "<html></html>"
+        page.inner_text.return_value = "text"
+        return page
+
+    mock_context = AsyncMock()
+    mock_context.new_page.side_effect = new_page
+    mock_browser = AsyncMock()
+    mock_browser.new_context.return_value = mock_context
+    mocker.patch("sources.news.trafilatura.extract", return_value=None)
+
+    items = asyncio.run(news.fetch({**NEWS_CONFIG, "urls": urls, "max_pages": 3}, browser=mock_browser))
+
+    import hashlib
+    fingerprint = hashlib.sha256(b"text").hexdigest()
+    expected = [
+        hashlib.md5(f"{u}\n{fingerprint}".encode()).hexdigest()
+        for u in urls
+        if not u.endswith("/3")
+    ]
+    assert [i.id for i in items] == expected
+    assert peak == 3
+
+
+def _browser_that_must_not_be_used():
+    mock_browser = AsyncMock()
+    mock_browser.new_context.side_effect = AssertionError("browser should not be used")
+    return mock_browser
+
+
+def test_fetch_uses_http_when_extraction_is_long_enough(mocker, mock_http_session):
+    mocker.patch("sources.news.trafilatura.extract", return_value="a" * 600)
+
+    items = asyncio.run(news.fetch(NEWS_CONFIG, browser=_browser_that_must_not_be_used()))
+
+    assert items[0].content == "a" * 600
+    mock_http_session.get.assert_called_once()
+
+
+def test_fetch_falls_back_to_browser_and_remembers_domain(mocker, mock_http_session):
+    import cache
+
+    mock_page = AsyncMock()
+    mock_page.goto.return_value = None
+    mock_page.content.return_value = "<html></html>"
+    mock_context = AsyncMock()
+    mock_context.new_page.return_value = mock_page
+    mock_browser = AsyncMock()
+    mock_browser.new_context.return_value = mock_context
+    mocker.patch("sources.news.trafilatura.extract", return_value="too short")
+
+    asyncio.run(news.fetch(NEWS_CONFIG, browser=mock_browser))
+    mock_page.goto.assert_called_once()
+    assert "example.com" in cache.load_state("news_domains")
+
+    # The next run goes straight to the browser for that domain.
+    mock_http_session.get.reset_mock()
+    asyncio.run(news.fetch(NEWS_CONFIG, browser=mock_browser))
+    mock_http_session.get.assert_not_called()
+
+
+def test_fetch_extracts_identical_html_only_once(mocker, mock_http_session):
+    mock_http_session.get.return_value = MagicMock(
+        text="<html>same page</html>", status_code=200, headers={}
+    )
+    extract = mocker.patch("sources.news.trafilatura.extract", return_value="a" * 600)
+    cfg = {**NEWS_CONFIG, "urls": ["https://a.example/x", "https://b.example/y"]}
+
+    items = asyncio.run(news.fetch(cfg, browser=_browser_that_must_not_be_used()))
+    # The result is persisted, so the next run does not parse it either.
+    asyncio.run(news.fetch(cfg, browser=_browser_that_must_not_be_used()))
+
+    assert extract.call_count == 1
+    assert [i.content for i in items] == ["a" * 600, "a" * 600]
+
+
+def test_extractor_runs_trafilatura_in_worker_processes():
+    html = "<html><body><article><p>" + "Worker process text. " * 40 + "</p></article></body></html>"
+
+    async def run():
+        extractor = news._Extractor(workers=1)
+        try:
+            return await extractor.extract(html)
+        finally:
+            extractor.close()
+
+    assert "Worker process text." in asyncio.run(run())
+
+
+def test_fetch_skips_unchanged_content(mocker, mock_http_session):
+    mocker.patch("sources.news.trafilatura.extract", return_value="a" * 600)
+
+    first = asyncio.run(news.fetch(NEWS_CONFIG, browser=_browser_that_must_not_be_used()))
+    news.commit(first)
+    second = asyncio.run(news.fetch(NEWS_CONFIG, browser=_browser_that_must_not_be_used()))
+
+    assert len(first) == 1
+    assert second == []
+
+
+def test_fetch_returns_page_again_until_its_item_is_committed(mocker, mock_http_session):
+    mocker.patch("sources.news.trafilatura.extract", return_value="a" * 600)
+    mock_http_session.get.return_value = MagicMock(
+        text="<html></html>", status_code=200, headers={"etag": '"v1"'}
+    )
+
+    first = asyncio.run(news.fetch(NEWS_CONFIG, browser=_browser_that_must_not_be_used()))
+    # the summary failed, so main commits without the item
+    news.commit([])
+    second = asyncio.run(news.fetch(NEWS_CONFIG, browser=_browser_that_must_not_be_used()))
+
+    assert [i.id for i in second] == [i.id for i in first]
+    assert "If-None-Match" not in mock_http_session.get.call_args.kwargs["headers"]
+
+
+def test_fetch_sends_validators_and_skips_not_modified_pages(mocker, mock_http_session):
+    extract = mocker.patch("sources.news.trafilatura.extract", return_value="a" * 600)
+    mock_http_session.get.return_value = MagicMock(
+        text="<html></html>", status_code=200, headers={"etag": '"v1"'}
+    )
+    news.commit(asyncio.run(news.fetch(NEWS_CONFIG, browser=_browser_that_must_not_be_used())))
+
+    mock_http_session.get.return_value = MagicMock(text="", status_code=304, headers={})
+    items = asyncio.run(news.fetch(NEWS_CONFIG, browser=_browser_that_must_not_be_used()))
+
+    assert items == []
+    assert mock_http_session.get.call_args.kwargs["headers"]["If-None-Match"] == '"v1"'
+    assert extract.call_count == 1
+
+
+def test_fetch_remembers_page_whose_item_was_already_seen(mocker, mock_http_session):
+    import cache
+    import main
+
+    mocker.patch("sources.news.trafilatura.extract", return_value="a" * 600)
+    mocker.patch("main.llm.summarize", return_value="summary")
+    cfg = {**NEWS_CONFIG, "urls": ["https://a.example/x", "https://b.example/y"]}
+    items = asyncio.run(news.fetch(cfg, browser=_browser_that_must_not_be_used()))
+    # The first page went back to content already summarized within the cache window.
+    cache.mark_seen(items[:1], cache.CACHE_DIR / "news.json")
+
+    main._summarize_source("news", cfg, items, {})
+    again = asyncio.run(news.fetch(cfg, browser=_browser_that_must_not_be_used()))
+
+    assert again == []
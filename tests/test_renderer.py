@@ -0,0 +1,32 @@
+# tests/test_renderer.py
+import renderer
+from sources.base import Item
+
+
+def make_item(source: str, content: str = "stuff", data: dict | None = None) -> Item:
+    return Item(id="1", source=source, content=content, timestamp="2026-01-01T00:00:00", data=data)
+
+
+def test_render_uses_default_template_for_source():
+    items = [
+        make_item("calendar", data={"title": "Standup", "start": "Mon 23 Feb 08:00 UTC"}),
+        make_item("calendar", data={"title": "Dentist", "start": "Tue 24 Feb 15:00 UTC"}),
+    ]
+    assert renderer.render(items, "calendar", {}) == (
+        "- Mon 23 Feb 08:00 UTC: Standup\n- Tue 24 Feb 15:00 UTC: Dentist"
+    )
+
+
+def test_render_uses_configured_template_and_item_fields():
+    item = make_item("weather", content="raw", data={"tempf": 72.0})
+    result = renderer.render([item], "weather", {"template": "{tempf:.0f}F ({source}, {content})"})
+    assert result == "72F (weather, raw)"
+
+
+def test_render_marks_missing_fields():
+    item = make_item("weather", data={"tempf": 72.0})
+    assert renderer.render([item], "weather", {"template": "{tempf} / {humidity}"}) == "72.0 / ?"
+
+
+def test_render_falls_back_to_content_without_data():
+    assert renderer.render([make_item("email", "Hello")], "email", {}) == "- Hello"
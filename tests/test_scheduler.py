@@ -0,0 +1,67 @@
+# tests/test_scheduler.py
+import threading
+import time
+
+from scheduler import Scheduler
+
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_slot_caps_concurrency():
+    sched = Scheduler()
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def work():
+        with sched.slot(limit=2):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert max(peak) == 2
+
+
+def test_slot_serves_higher_priority_first():
+    sched = Scheduler()
+    order = []
+    release = threading.Event()
+
+    def hold():
+        with sched.slot(limit=1):
+            release.wait()
+
+    def work(name, priority):
+        with sched.slot(limit=1, priority=priority):
+            order.append(name)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    _wait_until(lambda: sched.active == 1)
+    waiters = [
+        threading.Thread(target=work, args=("low", 0)),
+        threading.Thread(target=work, args=("high", 10)),
+        threading.Thread(target=work, args=("low-later", 0)),
+    ]
+    for t in waiters:
+        t.start()
+        _wait_until(lambda: sched.waiting == waiters.index(t) + 1)
+    release.set()
+    for t in [holder, *waiters]:
+        t.join()
+
+    assert order == ["high", "low", "low-later"]
@@ -9,7 +9,7 @@ def test_summarize_posts_to_ollama_and_returns_response():
     mock_resp.json.return_value = {"response": "Short summary."}
     mock_resp.raise_for_status = MagicMock()
 
-    with patch("summarizer.requests.post", return_value=mock_resp) as mock_post:
+    with patch("llm.http_client.post", return_value=mock_resp) as mock_post:
         result = summarize("Long text here.", OLLAMA_CFG)
 
     assert result == "Short summary."
@@ -28,7 +28,7 @@ def test_summarize_includes_length_instruction_in_prompt():
     mock_resp.json.return_value = {"response": "OK"}
     mock_resp.raise_for_status = MagicMock()
 
-    with patch("summarizer.requests.post", return_value=mock_resp) as mock_post:
+    with patch("llm.http_client.post", return_value=mock_resp) as mock_post:
         summarize("some text", OLLAMA_CFG)
 
     prompt = mock_post.call_args.kwargs["json"]["prompt"]
@@ -40,7 +40,7 @@ def test_summarize_uses_configured_timeout():
     mock_resp.json.return_value = {"response": "ok"}
     mock_resp.raise_for_status = MagicMock()
 
-    with patch("summarizer.requests.post", return_value=mock_resp) as mock_post:
+    with patch("llm.http_client.post", return_value=mock_resp) as mock_post:
         summarize("text", {**OLLAMA_CFG, "timeout": 60})
 
     assert mock_post.call_args.kwargs["timeout"] == 60
@@ -50,9 +50,21 @@ def test_summarize_raises_on_ollama_error():
     mock_resp = MagicMock()
     mock_resp.raise_for_status.side_effect = Exception("Ollama error")
 
-    with patch("summarizer.requests.post", return_value=mock_resp):
+    with patch("llm.http_client.post", return_value=mock_resp):
         try:
             summarize("text", OLLAMA_CFG)
             assert False, "Should have raised"
         except Exception as e:
             assert "Ollama error" in str(e)
+
+
+def test_summarize_reuses_cached_response():
+    mock_resp = MagicMock()
+    mock_resp.json.return_value = {"response": "ok"}
+    mock_resp.raise_for_status = MagicMock()
+
+    with patch("llm.http_client.post", return_value=mock_resp) as mock_post:
+        summarize("same digest", OLLAMA_CFG)
+        summarize("same digest", OLLAMA_CFG)
+
+    assert mock_post.call_count == 1
@@ -1,3 +1,5 @@
+import asyncio
+import json
 from datetime import datetime, timezone
 
 from sources import twitter
@@ -20,28 +22,37 @@ class FakePage:
         self.reloaded = 0
         self.scrolls = 0
         self.waits = []
+        self.function_waits = []
 
-    def goto(self, url, wait_until=None, timeout=None):
+    @property
+    def url(self):
+        return self.goto_urls[-1] if self.goto_urls else "about:blank"
+
+    async def goto(self, url, wait_until=None, timeout=None):
         self.goto_urls.append(url)
 
-    def wait_for_timeout(self, ms):
+    async def wait_for_timeout(self, ms):
         self.waits.append(ms)
 
-    def reload(self, wait_until=None, timeout=None):
+    async def reload(self, wait_until=None, timeout=None):
         self.reloaded += 1
 
-    def close(self):
+    async def close(self):
         self.closed = True
 
-    def eval_on_selector_all(self, selector, script):
-        idx = self.eval_calls
-        self.eval_calls += 1
-        if idx < len(self.rows_per_eval):
-            return self.rows_per_eval[idx]
-        return []
+    async def evaluate(self, js, arg=None):
+        # Stands in for the in-page collector: each drain yields the next batch.
+        if "drain()" in js:
+            idx = self.eval_calls
+            self.eval_calls += 1
+            if idx < len(self.rows_per_eval):
+                return self.rows_per_eval[idx]
+            return []
+        if "scrollBy" in js:
+            self.scrolls += 1
 
-    def evaluate(self, js):
-        self.scrolls += 1
+    async def wait_for_function(self, expression, arg=None, timeout=None):
+        self.function_waits.append((arg, timeout))
 
 
 class FakeContext:
@@ -50,21 +61,33 @@ class FakeContext:
         self.cookies = None
         self.closed = False
 
-    def add_cookies(self, cookies):
+    async def add_cookies(self, cookies):
         self.cookies = cookies
 
-    def new_page(self):
+    async def storage_state(self, path=None):
+        self.saved_state_path = path
+        with open(path, "w") as f:
+            f.write('{"cookies": [], "origins": []}')
+
+    async def new_page(self):
         return self.pages.pop(0)
 
-    def close(self):
+    async def close(self):
         self.closed = True
 
 
 class FakeBrowser:
     def __init__(self, context):
         self.context = context
-
-    def new_context(self, **kwargs):
+        self.context_kwargs = []
+
+    async def new_context(self, **kwargs):
+        self.context_kwargs.append(kwargs)
+        storage_state = kwargs.get("storage_state")
+        if storage_state is not None:
+            # Playwright parses the stored state when creating the context.
+            with open(storage_state) as f:
+                json.load(f)
         return self.context
 
 
@@ -83,17 +106,13 @@ def test_extract_tweet_parts():
     assert twitter._extract_tweet_parts("/abc/likes") == (None, None)
 
 
-def test_extract_tweets_from_page_uses_timestamp_or_now():
+def test_tweets_from_rows_uses_timestamp_or_now():
     now = datetime.now(timezone.utc)
-    page = FakePage(
-        rows_per_eval=[
-            [
-                _tweet_row("1001", "Hello", timestamp="2026-02-19T10:00:00.000Z"),
-                _tweet_row("1002", "No time"),
-            ]
-        ]
-    )
-    items = twitter._extract_tweets_from_page(page)
+    rows = [
+        _tweet_row("1001", "Hello", timestamp="2026-02-19T10:00:00.000Z"),
+        _tweet_row("1002", "No time"),
+    ]
+    items = twitter._tweets_from_rows(rows)
     assert len(items) == 2
     assert items[0].id == "1001"
     assert items[0].content == "Hello"
@@ -101,16 +120,12 @@ def test_extract_tweets_from_page_uses_timestamp_or_now():
     assert datetime.fromisoformat(items[1].timestamp.replace("Z", "+00:00")) >= now
 
 
-def test_extract_tweets_from_page_filters_by_author():
-    page = FakePage(
-        rows_per_eval=[
-            [
-                _tweet_row("2001", "From user1", author="user1"),
-                _tweet_row("2002", "From other", author="other"),
-            ]
-        ]
-    )
-    items = twitter._extract_tweets_from_page(page, allowed_authors={"user1"})
+def test_tweets_from_rows_filters_by_author():
+    rows = [
+        _tweet_row("2001", "From user1", author="user1"),
+        _tweet_row("2002", "From other", author="other"),
+    ]
+    items = twitter._tweets_from_rows(rows, allowed_authors={"user1"})
     assert len(items) == 1
     assert items[0].id == "2001"
 
@@ -124,11 +139,13 @@ def test_scrape_home_feed_dedupes_and_stops_at_count():
         ]
     )
     context = FakeContext([page])
-    items = twitter._scrape_home_feed(
-        context=context,
-        count=3,
-        max_scrolls=6,
-        scroll_pause_ms=1,
+    items = asyncio.run(
+        twitter._scrape_home_feed(
+            context=context,
+            count=3,
+            max_scrolls=6,
+            scroll_pause_ms=1,
+        )
     )
     assert [x.id for x in items] == ["3001", "3002", "3003"]
     assert page.goto_urls[0] == "https://x.com/home"
@@ -140,11 +157,13 @@ def test_scrape_home_feed_exits_early_on_no_growth():
     rows = [_tweet_row("4001", "Same")]
     page = FakePage(rows_per_eval=[rows, rows, rows, rows, rows])
     context = FakeContext([page])
-    twitter._scrape_home_feed(
-        context=context,
-        count=20,
-        max_scrolls=10,
-        scroll_pause_ms=1,
+    asyncio.run(
+        twitter._scrape_home_feed(
+            context=context,
+            count=20,
+            max_scrolls=10,
+            scroll_pause_ms=1,
+        )
     )
     # Should stop after 2 no-growth rounds, not exhaust max_scrolls.
     assert page.scrolls < 10
@@ -167,7 +186,7 @@ def test_fetch_applies_cookies_primes_session_and_uses_feed_mode(mocker):
         ],
     )
 
-    items = twitter.fetch(TWITTER_CONFIG, browser=browser)
+    items = asyncio.run(twitter.fetch(TWITTER_CONFIG, browser=browser))
 
     assert len(items) == 1
     assert items[0].id == "5001"
@@ -187,7 +206,444 @@ def test_fetch_builds_allowed_authors_when_filter_enabled(mocker):
     context = FakeContext([prime_page])
     browser = FakeBrowser(context)
 
-    twitter.fetch(cfg, browser=browser)
+    asyncio.run(twitter.fetch(cfg, browser=browser))
 
     call_kwargs = twitter._scrape_home_feed.call_args.kwargs
     assert call_kwargs["allowed_authors"] == {"alice", "bob"}
+
+
+def _timeline_payload(*tweets: tuple[str, str, str]) -> dict:
+    entries = []
+    for tweet_id, author, text in tweets:
+        entries.append(
+            {
+                "content": {
+                    "itemContent": {
+                        "tweet_results": {
+                            "result": {
+                                "__typename": "Tweet",
+                                "rest_id": tweet_id,
+                                "core": {
+                                    "user_results": {
+                                        "result": {"legacy": {"screen_name": author}}
+                                    }
+                                },
+                                "legacy": {
+                                    "full_text": text,
+                                    "created_at": "Thu Feb 19 10:00:00 +0000 2026",
+                                },
+                            }
+                        }
+                    }
+                }
+            }
+        )
+    return {
+        "data": {
+            "home": {
+                "home_timeline_urt": {
+                    "instructions": [{"type": "TimelineAddEntries", "entries": entries}]
+                }
+            }
+        }
+    }
+
+
+class FakeResponse:
+    def __init__(self, url, payload):
+        self.url = url
+        self.payload = payload
+
+    async def json(self):
+        return self.payload
+
+
+class FakeNetworkPage(FakePage):
+    """Emits one timeline response on load and one per scroll."""
+
+    def __init__(self, payloads):
+        super().__init__()
+        self.payloads = list(payloads)
+        self.handlers = []
+
+    def on(self, event, handler):
+        if event == "response":
+            self.handlers.append(handler)
+
+    async def _emit_next(self):
+        if not self.payloads:
+            return
+        response = FakeResponse(
+            "https://x.com/i/api/graphql/abc/HomeTimeline?variables=x",
+            self.payloads.pop(0),
+        )
+        for handler in self.handlers:
+            await handler(response)
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        await super().goto(url, wait_until, timeout)
+        await self._emit_next()
+
+    async def evaluate(self, js, arg=None):
+        await super().evaluate(js, arg)
+        await self._emit_next()
+
+
+def test_tweets_from_timeline_payload_parses_items():
+    payload = _timeline_payload(("6001", "alice", "Hello"), ("6002", "bob", "Hi"))
+    items = twitter._tweets_from_timeline_payload(payload, allowed_authors={"alice"})
+    assert [i.id for i in items] == ["6001"]
+    assert items[0].content == "Hello"
+    assert items[0].timestamp == "2026-02-19T10:00:00+00:00"
+
+
+def test_scrape_home_feed_from_network_stops_at_count():
+    page = FakeNetworkPage(
+        [
+            _timeline_payload(("7001", "a", "one"), ("7002", "a", "two")),
+            _timeline_payload(("7002", "a", "two"), ("7003", "a", "three")),
+            _timeline_payload(("7004", "a", "four")),
+        ]
+    )
+    items = asyncio.run(
+        twitter._scrape_home_feed_from_network(
+            context=FakeContext([page]), count=3, max_scrolls=8, response_timeout_ms=100
+        )
+    )
+    assert [i.id for i in items] == ["7001", "7002", "7003"]
+    assert page.scrolls == 1
+    assert page.eval_calls == 0  # never serializes the DOM
+    assert page.closed is True
+
+
+def test_scrape_home_feed_from_network_stops_when_responses_dry_up():
+    page = FakeNetworkPage([_timeline_payload(("8001", "a", "one"))])
+    items = asyncio.run(
+        twitter._scrape_home_feed_from_network(
+            context=FakeContext([page]), count=20, max_scrolls=8, response_timeout_ms=10
+        )
+    )
+    assert [i.id for i in items] == ["8001"]
+    assert page.scrolls == 1
+
+
+def test_scrape_home_feed_stops_at_high_water_mark():
+    page = FakePage(
+        rows_per_eval=[
+            [_tweet_row("9005", "new"), _tweet_row("9004", "new too")],
+            [
+                _tweet_row("9003", "new three"),
+                _tweet_row("9002", "seen last run"),
+                _tweet_row("9001", "older"),
+                _tweet_row("9000", "older still"),
+            ],
+            [_tweet_row("8999", "oldest")],
+        ]
+    )
+    items = asyncio.run(
+        twitter._scrape_home_feed(
+            context=FakeContext([page]),
+            count=20,
+            max_scrolls=8,
+            scroll_pause_ms=1,
+            since_id=9002,
+        )
+    )
+    assert [i.id for i in items] == ["9005", "9004", "9003"]
+    assert page.scrolls == 1
+
+
+def test_scrape_home_feed_from_network_stops_at_high_water_mark():
+    page = FakeNetworkPage(
+        [
+            _timeline_payload(
+                ("9105", "a", "new"),
+                ("9100", "a", "seen"),
+                ("9099", "a", "older"),
+                ("9098", "a", "older"),
+            ),
+            _timeline_payload(("9097", "a", "oldest")),
+        ]
+    )
+    items = asyncio.run(
+        twitter._scrape_home_feed_from_network(
+            context=FakeContext([page]),
+            count=20,
+            max_scrolls=8,
+            response_timeout_ms=100,
+            since_id=9100,
+        )
+    )
+    assert [i.id for i in items] == ["9105"]
+    assert page.scrolls == 0
+
+
+def test_fetch_persists_and_reuses_high_water_mark(mocker):
+    import cache
+
+    scrape = mocker.patch(
+        "sources.twitter._scrape_home_feed",
+        return_value=[
+            twitter.Item(id="120", source="twitter", content="a", timestamp="t"),
+            twitter.Item(id="119", source="twitter", content="b", timestamp="t"),
+        ],
+    )
+    items = asyncio.run(twitter.fetch(TWITTER_CONFIG, browser=FakeBrowser(FakeContext([FakePage()]))))
+    assert scrape.call_args.kwargs["since_id"] is None
+    assert cache.load_state("twitter_state") == {}
+
+    twitter.commit(items)
+    assert cache.load_state("twitter_state")["high_water"] == {"https://x.com/home": "120"}
+
+    asyncio.run(twitter.fetch(TWITTER_CONFIG, browser=FakeBrowser(FakeContext([FakePage()]))))
+    assert scrape.call_args.kwargs["since_id"] == 120
+
+
+def test_commit_keeps_high_water_mark_when_items_were_not_seen(mocker):
+    import cache
+
+    scrape = mocker.patch(
+        "sources.twitter._scrape_home_feed",
+        return_value=[
+            twitter.Item(id="120", source="twitter", content="a", timestamp="t"),
+            twitter.Item(id="119", source="twitter", content="b", timestamp="t"),
+        ],
+    )
+    items = asyncio.run(twitter.fetch(TWITTER_CONFIG, browser=FakeBrowser(FakeContext([FakePage()]))))
+    # the summary failed, so main commits without the items
+    twitter.commit(items[:1])
+    asyncio.run(twitter.fetch(TWITTER_CONFIG, browser=FakeBrowser(FakeContext([FakePage()]))))
+
+    assert cache.load_state("twitter_state") == {}
+    assert scrape.call_args.kwargs["since_id"] is None
+
+
+def test_fetch_reuses_stored_session_without_priming(mocker):
+    mocker.patch("sources.twitter._scrape_home_feed", return_value=[])
+
+    first_prime = FakePage()
+    first_browser = FakeBrowser(FakeContext([first_prime]))
+    asyncio.run(twitter.fetch(TWITTER_CONFIG, browser=first_browser))
+    assert first_prime.reloaded == 1
+    assert first_browser.context_kwargs[0]["storage_state"] is None
+
+    second_context = FakeContext([])  # no page available for priming
+    second_browser = FakeBrowser(second_context)
+    asyncio.run(twitter.fetch(TWITTER_CONFIG, browser=second_browser))
+    assert second_browser.context_kwargs[0]["storage_state"].endswith("twitter_session.json")
+    assert second_context.saved_state_path.endswith("twitter_session.json.tmp")
+
+
+def test_fetch_primes_new_session_when_stored_one_is_corrupt(mocker, isolated_cache_dir):
+    isolated_cache_dir.mkdir(parents=True)
+    session_file = isolated_cache_dir / "twitter_session.json"
+    session_file.write_text('{"cookies": [')
+    mocker.patch("sources.twitter._scrape_home_feed", return_value=[])
+    prime_page = FakePage()
+    browser = FakeBrowser(FakeContext([prime_page]))
+
+    asyncio.run(twitter.fetch(TWITTER_CONFIG, browser=browser))
+
+    assert browser.context_kwargs[-1]["storage_state"] is None
+    assert prime_page.reloaded == 1
+    assert json.loads(session_file.read_text()) == {"cookies": [], "origins": []}
+    assert session_file.stat().st_mode & 0o777 == 0o600
+    assert not (isolated_cache_dir / "twitter_session.json.tmp").exists()
+
+
+def test_fetch_reprimes_when_stored_session_is_rejected(mocker, isolated_cache_dir):
+    isolated_cache_dir.mkdir(parents=True)
+    (isolated_cache_dir / "twitter_session.json").write_text("{}")
+    scrape = mocker.patch(
+        "sources.twitter._scrape_home_feed",
+        side_effect=[
+            twitter._SessionRejected("https://x.com/i/flow/login"),
+            [twitter.Item(id="1", source="twitter", content="a", timestamp="t")],
+        ],
+    )
+    prime_page = FakePage()
+    browser = FakeBrowser(FakeContext([prime_page]))
+
+    items = asyncio.run(twitter.fetch(TWITTER_CONFIG, browser=browser))
+
+    assert [i.id for i in items] == ["1"]
+    assert scrape.call_count == 2
+    assert prime_page.reloaded == 1
+    assert browser.context_kwargs[1]["storage_state"] is None
+
+
+def test_scrape_home_feed_raises_when_redirected_to_login():
+    class LoginPage(FakePage):
+        @property
+        def url(self):
+            return "https://x.com/i/flow/login"
+
+    page = LoginPage()
+    try:
+        asyncio.run(
+            twitter._scrape_home_feed(
+                context=FakeContext([page]), count=5, max_scrolls=2, scroll_pause_ms=1
+            )
+        )
+        assert False, "Should have raised"
+    except twitter._SessionRejected:
+        pass
+    assert page.closed is True
+
+
+def test_scrape_home_feed_waits_for_new_tweets_instead_of_sleeping():
+    page = FakePage(
+        rows_per_eval=[
+            [_tweet_row("9301", "A"), _tweet_row("9302", "B")],
+            [_tweet_row("9303", "C")],
+        ]
+    )
+    asyncio.run(
+        twitter._scrape_home_feed(
+            context=FakeContext([page]), count=3, max_scrolls=6, scroll_pause_ms=700
+        )
+    )
+    assert page.waits == []  # no fixed sleeps
+    # Initial load waits for a full batch, the scroll only for the one missing tweet.
+    assert page.function_waits == [(3, 700), (1, 700)]
+
+
+def test_fetch_scrapes_feeds_concurrently_and_dedupes(mocker):
+    import cache
+
+    running = 0
+    peak = 0
+
+    async def fake_scrape(context, url, since_id=None, **kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if url.endswith("/broken"):
+            raise RuntimeError("feed failed")
+        ids = {"https://x.com/i/lists/1": ["50", "40"], "https://x.com/alice": ["45", "40"]}[url]
+        return [twitter.Item(id=i, source="twitter", content=i, timestamp="t") for i in ids]
+
+    mocker.patch("sources.twitter._scrape_home_feed", side_effect=fake_scrape)
+    cfg = {
+        **TWITTER_CONFIG,
+        "feeds": ["https://x.com/i/lists/1", "https://x.com/alice", "https://x.com/broken"],
+        "max_feeds": 2,
+    }
+
+    items = asyncio.run(twitter.fetch(cfg, browser=FakeBrowser(FakeContext([FakePage()]))))
+    twitter.commit(items)
+
+    assert [i.id for i in items] == ["50", "40", "45"]
+    assert peak == 2
+    assert cache.load_state("twitter_state")["high_water"] == {
+        "https://x.com/i/lists/1": "50",
+        "https://x.com/alice": "45",
+    }
+
+
+def test_tweets_from_rows_skips_pinned_tweets():
+    rows = [{**_tweet_row("1", "Pinned long ago"), "pinned": True}, _tweet_row("2", "Fresh")]
+    assert [i.id for i in twitter._tweets_from_rows(rows)] == ["2"]
+
+
+def test_scrape_home_feed_does_not_stop_at_retweets_or_ads():
+    page = FakePage(
+        rows_per_eval=[
+            [
+                _tweet_row("9205", "new"),
+                {**_tweet_row("1000", "old tweet retweeted just now"), "retweet": True},
+                {**_tweet_row("1001", "an ad"), "promoted": True},
+                _tweet_row("9204", "new too"),
+            ],
+            [_tweet_row("9200", "seen last run"), _tweet_row("9199", "b"), _tweet_row("9198", "c")],
+        ]
+    )
+    items = asyncio.run(
+        twitter._scrape_home_feed(
+            context=FakeContext([page]),
+            count=20,
+            max_scrolls=8,
+            scroll_pause_ms=1,
+            since_id=9200,
+        )
+    )
+    assert [i.id for i in items] == ["9205", "1000", "9204"]
+    assert items[1].data == {"retweet": True}
+    assert page.scrolls == 1
+
+
+def test_scrape_home_feed_from_network_does_not_stop_at_retweets_or_ads():
+    first = _timeline_payload(
+        ("9305", "a", "new"), ("9304", "a", "rt"), ("9303", "a", "ad"), ("9302", "a", "new too")
+    )
+    entries = first["data"]["home"]["home_timeline_urt"]["instructions"][0]["entries"]
+    retweet = entries[1]["content"]["itemContent"]["tweet_results"]["result"]
+    original = _timeline_payload(("1000", "b", "old tweet"))["data"]["home"]["home_timeline_urt"]
+    retweet["legacy"]["retweeted_status_result"] = (
+        original["instructions"][0]["entries"][0]["content"]["itemContent"]["tweet_results"]
+    )
+    entries[2]["content"]["itemContent"]["promotedMetadata"] = {"advertiser_results": {}}
+    page = FakeNetworkPage(
+        [first, _timeline_payload(("9300", "a", "seen"), ("9299", "a", "b"), ("9298", "a", "c"))]
+    )
+
+    items = asyncio.run(
+        twitter._scrape_home_feed_from_network(
+            context=FakeContext([page]),
+            count=20,
+            max_scrolls=8,
+            response_timeout_ms=100,
+            since_id=9300,
+        )
+    )
+
+    assert [i.id for i in items] == ["9305", "1000", "9302"]
+    assert items[1].data == {"retweet": True}
+    assert page.scrolls == 1
+
+
+def test_high_water_mark_advances_when_some_tweets_were_already_seen(mocker):
+    import cache
+    import main
+
+    fetched = [
+        twitter.Item(id="101", source="twitter", content="new", timestamp="t"),
+        twitter.Item(id="100", source="twitter", content="retweeted again", timestamp="t"),
+    ]
+    mocker.patch("sources.twitter._scrape_home_feed", return_value=fetched)
+    mocker.patch("main.llm.summarize", return_value="summary")
+    cache.mark_seen(fetched[1:], cache.CACHE_DIR / "twitter.json")
+
+    items = asyncio.run(twitter.fetch(TWITTER_CONFIG, browser=FakeBrowser(FakeContext([FakePage()]))))
+    main._summarize_source("twitter", TWITTER_CONFIG, items, {})
+
+    assert cache.load_state("twitter_state")["high_water"] == {"https://x.com/home": "101"}
+
+
+def test_scrape_home_feed_keeps_scrolling_past_out_of_order_old_tweets():
+    # "For you" mixes older tweets in; a few of them must not end the scrape.
+    page = FakePage(
+        rows_per_eval=[
+            [_tweet_row("9405", "new"), _tweet_row("9300", "old"), _tweet_row("9299", "old")],
+            [
+                {**_tweet_row("100", "retweet"), "retweet": True},
+                _tweet_row("9404", "newer than the mark"),
+                _tweet_row("9301", "old"),
+            ],
+            [_tweet_row("9298", "old"), _tweet_row("9297", "old"), _tweet_row("9296", "old")],
+            [_tweet_row("9403", "never reached")],
+        ]
+    )
+    items = asyncio.run(
+        twitter._scrape_home_feed(
+            context=FakeContext([page]),
+            count=20,
+            max_scrolls=8,
+            scroll_pause_ms=1,
+            since_id=9400,
+        )
+    )
+    assert [i.id for i in items] == ["9405", "100", "9404"]
+    assert page.scrolls == 2
@@ -17,13 +17,13 @@ def _make_ambient_resp(with_coords=False):
     return device
 
 def _make_points_resp():
-    resp = MagicMock()
+    resp = MagicMock(status_code=200, headers={})
     resp.raise_for_status = lambda: None
     resp.json.return_value = {"properties": {"forecast": "https://api.weather.gov/gridpoints/BOI/1,2/forecast"}}
     return resp
 
-def _make_forecast_resp(forecast="Sunny and warm."):
-    resp = MagicMock()
+def _make_forecast_resp(forecast="Sunny and warm.", expires=None):
+    resp = MagicMock(status_code=200, headers={"expires": expires} if expires else {})
     resp.raise_for_status = lambda: None
     resp.json.return_value = {"properties": {"periods": [{"name": "Today", "detailedForecast": forecast}]}}
     return resp
@@ -34,8 +34,17 @@ def _make_ambient_api_resp(device):
     resp.json.return_value = [device]
     return resp
 
+FORECAST_URL = "https://api.weather.gov/gridpoints/BOI/1,2/forecast"
+
+
+def _route(responses: dict):
+    """requests.get side effect for concurrent calls, keyed by URL."""
+    def get(url, **kwargs):
+        return responses[url]
+    return get
+
 def test_fetch_uses_coords_from_ambient_response(mocker):
-    mock_get = mocker.patch("sources.weather.requests.get")
+    mock_get = mocker.patch("sources.weather.http_client.get")
     mock_get.side_effect = [
         _make_ambient_api_resp(_make_ambient_resp(with_coords=True)),
         _make_points_resp(),
@@ -51,18 +60,18 @@ def test_fetch_uses_coords_from_ambient_response(mocker):
     assert "-116.202" in points_call_url
 
 def test_fetch_falls_back_to_config_coords(mocker):
-    mock_get = mocker.patch("sources.weather.requests.get")
+    mock_get = mocker.patch("sources.weather.http_client.get")
     config_with_coords = {**WEATHER_CONFIG, "nws_lat": "43.615", "nws_lon": "-116.202"}
-    mock_get.side_effect = [
-        _make_ambient_api_resp(_make_ambient_resp(with_coords=False)),
-        _make_points_resp(),
-        _make_forecast_resp(),
-    ]
+    mock_get.side_effect = _route({
+        weather.AMBIENT_URL: _make_ambient_api_resp(_make_ambient_resp(with_coords=False)),
+        "https://api.weather.gov/points/43.615,-116.202": _make_points_resp(),
+        FORECAST_URL: _make_forecast_resp(),
+    })
     items = weather.fetch(config_with_coords, browser=None)
     assert len(items) == 1
 
 def test_fetch_raises_if_no_coords_available(mocker):
-    mock_get = mocker.patch("sources.weather.requests.get")
+    mock_get = mocker.patch("sources.weather.http_client.get")
     mock_get.side_effect = [
         _make_ambient_api_resp(_make_ambient_resp(with_coords=False)),
     ]
@@ -70,8 +79,8 @@ def test_fetch_raises_if_no_coords_available(mocker):
         weather.fetch(WEATHER_CONFIG, browser=None)
 
 def test_fetch_item_has_stable_id(mocker):
-    mock_get = mocker.patch("sources.weather.requests.get")
-    empty_forecast = MagicMock()
+    mock_get = mocker.patch("sources.weather.http_client.get")
+    empty_forecast = MagicMock(status_code=200, headers={})
     empty_forecast.raise_for_status = lambda: None
     empty_forecast.json.return_value = {"properties": {"periods": []}}
     mock_get.side_effect = [
@@ -81,3 +90,57 @@ def test_fetch_item_has_stable_id(mocker):
     ]
     items = weather.fetch(WEATHER_CONFIG, browser=None)
     assert items[0].id == "weather-1700000000000"
+
+
+def test_fetch_caches_points_and_unexpired_forecast(mocker):
+    mock_get = mocker.patch("sources.weather.http_client.get")
+    mock_get.side_effect = _route({
+        weather.AMBIENT_URL: _make_ambient_api_resp(_make_ambient_resp(with_coords=True)),
+        "https://api.weather.gov/points/43.615,-116.202": _make_points_resp(),
+        FORECAST_URL: _make_forecast_resp(expires="Wed, 01 Jan 2100 00:00:00 GMT"),
+    })
+    weather.fetch(WEATHER_CONFIG, browser=None)
+    mock_get.reset_mock()
+
+    items = weather.fetch(WEATHER_CONFIG, browser=None)
+
+    assert "Sunny and warm." in items[0].content
+    assert [c.args[0] for c in mock_get.call_args_list] == [weather.AMBIENT_URL]
+    assert all(c.kwargs["timeout"] for c in mock_get.call_args_list)
+
+
+def test_fetch_state_survives_marking_items_seen(mocker):
+    import cache
+
+    mock_get = mocker.patch("sources.weather.http_client.get")
+    mock_get.side_effect = _route({
+        weather.AMBIENT_URL: _make_ambient_api_resp(_make_ambient_resp(with_coords=True)),
+        "https://api.weather.gov/points/43.615,-116.202": _make_points_resp(),
+        FORECAST_URL: _make_forecast_resp(expires="Wed, 01 Jan 2100 00:00:00 GMT"),
+    })
+    items = weather.fetch(WEATHER_CONFIG, browser=None)
+    # main's seen-item cache for the "weather" source
+    cache.mark_seen(items, cache.CACHE_DIR / "weather.json")
+    mock_get.reset_mock()
+
+    weather.fetch(WEATHER_CONFIG, browser=None)
+
+    assert [c.args[0] for c in mock_get.call_args_list] == [weather.AMBIENT_URL]
+
+
+def test_fetch_refreshes_expired_forecast_without_points_lookup(mocker):
+    mock_get = mocker.patch("sources.weather.http_client.get")
+    mock_get.side_effect = _route({
+        weather.AMBIENT_URL: _make_ambient_api_resp(_make_ambient_resp(with_coords=True)),
+        "https://api.weather.gov/points/43.615,-116.202": _make_points_resp(),
+        FORECAST_URL: _make_forecast_resp(expires="Mon, 01 Jan 2001 00:00:00 GMT"),
+    })
+    weather.fetch(WEATHER_CONFIG, browser=None)
+    mock_get.reset_mock()
+
+    weather.fetch(WEATHER_CONFIG, browser=None)
+
+    assert sorted(c.args[0] for c in mock_get.call_args_list) == [
+        weather.AMBIENT_URL,
+        FORECAST_URL,
+    ]